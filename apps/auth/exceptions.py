@@ -14,3 +14,8 @@ class ProfileIsNotActive(HTTPException):
 class TokenInvalid(HTTPException):
     def __init__(self, detail: str = "Token is invalid"):
         super().__init__(status_code=401, detail=detail)
+
+
+class PasswordHashingBusy(HTTPException):
+    def __init__(self, detail: str = "Too many authentication requests, retry later"):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": "1"})
@@ -5,19 +5,22 @@ from fastapi.security import HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.auth.exceptions import ProfileIsNotActive, WrongCredentials
-from apps.auth.schema import LoginSchema, TokenInfo
+from apps.auth.schema import AuthPrincipal, LoginSchema, TokenInfo
 from apps.auth.services import AuthService
 from apps.auth.utils import (
     create_access_token,
     create_refresh_token,
     get_current_active_profile,
     get_current_profile_by_refresh,
-    validate_password,
+    hash_password_async,
+    password_needs_rehash,
+    validate_password_async,
 )
 from apps.core.exceptions import NotFoundException
-from apps.database import get_db
+from apps.database import get_db, get_read_db
 from apps.profile.models import Profile
 from apps.profile.schemas import ProfileSchema
+from apps.profile.service import ProfileService
 
 http_bearer = HTTPBearer(auto_error=False)
 router = APIRouter(dependencies=[Depends(http_bearer)])
@@ -37,9 +40,13 @@ async def refresh_token(
 
 @router.get("/me", response_model=ProfileSchema)
 async def get_me(
-    current_profile: Profile = Depends(get_current_active_profile),
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return current_profile
+    profile = await ProfileService(db).get_one(current_profile.id)
+    if not profile:
+        raise NotFoundException("Profile not found")
+    return profile
 
 from fastapi import Form
 
@@ -55,7 +62,7 @@ async def auth_profile_issue_jwt_form(
     if not profile:
         raise NotFoundException("Profile not found")
 
-    if not validate_password(
+    if not await validate_password_async(
         password=password,
         hashed_password=profile.password,
     ):
@@ -64,6 +71,11 @@ async def auth_profile_issue_jwt_form(
     if not profile.is_active:
         raise ProfileIsNotActive()
 
+    if password_needs_rehash(profile.password):
+        # Пароль известен только при входе: переводим хеш на текущий work factor
+        new_hash = await hash_password_async(password)
+        await auth_service.update_one(profile.id, {"password": new_hash}, returning=(Profile.id,))
+
     access_token = await create_access_token(profile)
     refresh_token = await create_refresh_token(profile)
 
@@ -9,3 +9,9 @@ class TokenInfo(BaseModel):
 class LoginSchema(BaseModel):
     login: str
     password: str
+
+
+class AuthPrincipal(BaseModel):
+    """Минимальные данные профиля для авторизации запроса"""
+    id: int
+    is_active: bool
@@ -1,4 +1,8 @@
+import asyncio
+import hashlib
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
@@ -7,8 +11,10 @@ from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from apps.auth.exceptions import TokenInvalid, ProfileIsNotActive
+from apps.auth.exceptions import PasswordHashingBusy, TokenInvalid, ProfileIsNotActive
+from apps.auth.schema import AuthPrincipal
 from apps.auth.services import AuthService
+from apps.core.cache import LRUCache
 from apps.core.config import settings
 from apps.database import get_db
 from apps.profile.models import Profile
@@ -16,9 +22,9 @@ from apps.profile.schemas import ProfileSchema
 
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from apps.profile.service import ProfileService
 from apps.database import get_db
 from apps.profile.models import Profile
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 ALGORITHM = "HS256"
@@ -34,6 +40,16 @@ oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/v1/profile/login-form",
 )
 
+# sha256(token) -> проверенный payload, запись истекает вместе с токеном
+token_cache = LRUCache(maxsize=settings.JWT_CACHE_MAX_ENTRIES, ttl=0)
+
+# profile_id -> AuthPrincipal; сбрасывается при изменении/удалении профиля, TTL ограничивает
+# задержку для других процессов
+principal_cache = LRUCache(
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
 
 def encode_jwt(
     payload: dict,
@@ -62,11 +78,23 @@ def encode_jwt(
 
 
 def decode_jwt(token: str, secret_key: str = settings.AUTH_JWT.SECRET_KEY,) -> dict:
+    # Кешируются только токены, проверенные ключом по умолчанию
+    cacheable = secret_key == settings.AUTH_JWT.SECRET_KEY
+    cache_key = hashlib.sha256(token.encode()).digest() if cacheable else None
+    if cacheable:
+        payload = token_cache.get(cache_key)
+        if payload is not None:
+            return dict(payload)
     try:
         payload = jwt.decode(token, secret_key, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(status_code=401, detail="Token decode failed")
+    if cacheable and isinstance(payload.get("exp"), (int, float)):
+        # Запись живет не дольше самого токена
+        ttl = payload["exp"] - time.time()
+        if ttl > 0:
+            token_cache.set(cache_key, dict(payload), ttl=ttl)
+    return payload
 
 
 def hash_password(
@@ -74,7 +102,7 @@ def hash_password(
 ) -> str:
     return bcrypt.hashpw(
         password.encode(),
-        bcrypt.gensalt()
+        bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     ).decode('utf-8')
 
 
@@ -85,6 +113,42 @@ def validate_password(
     return bcrypt.checkpw(password.encode(), hashed_password.encode())
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Хеш создан с другим work factor: $2b$<rounds>$..."""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+# bcrypt отпускает GIL, поэтому хеширование в потоках не блокирует event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt",
+)
+_password_jobs = 0
+
+
+async def _run_password_job(func, *args):
+    """Выполнение bcrypt в password_executor с ограничением очереди"""
+    global _password_jobs
+    if _password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+        raise PasswordHashingBusy()
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_job(hash_password, password)
+
+
+async def validate_password_async(password: str, hashed_password: str) -> bool:
+    return await _run_password_job(validate_password, password, hashed_password)
+
+
 async def generate_jwt_token(
     token_type: str,
     token_data: dict,
@@ -168,7 +232,7 @@ async def get_current_active_profile(
     request: Request,
     db: AsyncSession = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(http_bearer)
-) -> Profile:
+) -> AuthPrincipal:
     token = None
 
     # 1. Authorization header
@@ -189,12 +253,32 @@ async def get_current_active_profile(
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token decode failed")
 
-    profile_service = ProfileService(db)
-    profile = await profile_service.get_one(int(profile_id))
-    if not profile or not profile.is_active:
+    principal = await get_auth_principal(int(profile_id), db)
+    if not principal or not principal.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive or missing profile")
 
-    return profile
+    # Профиль запроса для маршрутизации чтений (см. apps.database.get_read_db)
+    request.state.profile_id = principal.id
+
+    return principal
+
+
+async def get_auth_principal(profile_id: int, db: AsyncSession) -> AuthPrincipal | None:
+    """(id, is_active) профиля: из кеша, при промахе - запрос только этих двух колонок"""
+    principal = principal_cache.get(profile_id)
+    if principal is None:
+        result = await db.execute(select(Profile.id, Profile.is_active).where(Profile.id == profile_id))
+        row = result.one_or_none()
+        if not row:
+            return None
+        principal = AuthPrincipal(id=row.id, is_active=bool(row.is_active))
+        principal_cache.set(profile_id, principal)
+    return principal
+
+
+def invalidate_auth_principal(profile_id: int) -> None:
+    """Сброс кеша после изменения или удаления профиля"""
+    principal_cache.pop(profile_id)
 
 
 # async def get_access_token_from_cookies(access_token: str = Cookie(None)):
@@ -0,0 +1,111 @@
+import functools
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """In-process LRU-кеш с TTL и счетчиками попаданий/промахов/вытеснений"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ProfileVersionedCache:
+    """Кеш, ключи которого включают версию данных профиля.
+
+    Любая запись в данные профиля вызывает bump(), после чего старые записи
+    становятся недостижимыми и вытесняются по LRU/TTL. Счетчик bump() локален для
+    процесса: если у экземпляра сервиса задан cache_version (версия данных из БД,
+    та же, что в ETag), ключ строится по ней.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self.entries = LRUCache(maxsize, ttl)
+        self._versions: Dict[int, int] = {}
+
+    def version(self, profile_id: int) -> int:
+        return self._versions.get(profile_id, 0)
+
+    def bump(self, profile_id: int) -> None:
+        self._versions[profile_id] = self._versions.get(profile_id, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.entries.stats(), "enabled": self.enabled, "profiles": len(self._versions)}
+
+    def cached(self, method: Callable) -> Callable:
+        """Декоратор для async-методов чтения с аргументом profile_id"""
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return await method(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            instance = arguments.pop("self", None)
+            profile_id = arguments["profile_id"]
+            version = getattr(instance, "cache_version", None)
+            if version is None:
+                # Версия фиксируется до чтения: результат, полученный во время записи, не попадет под новую версию
+                version = self.version(profile_id)
+            key = (profile_id, version, method.__qualname__, tuple(sorted(arguments.items())))
+
+            value = self.entries.get(key, _MISSING)
+            if value is _MISSING:
+                value = await method(*args, **kwargs)
+                self.entries.set(key, value)
+            return value
+
+        return wrapper
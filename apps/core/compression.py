@@ -0,0 +1,152 @@
+import zlib
+from typing import Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from apps.core.etag import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli не обязателен
+    brotli = None
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data: bytes) -> bytes:
+        # SYNC_FLUSH: каждый фрагмент потока сразу уходит клиенту
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """Сжатие ответов gzip/brotli (brotli - если установлен) по Accept-Encoding.
+
+    Ответ из одного фрагмента сжимается, если он не меньше minimum_size; потоковые
+    ответы сжимаются пофрагментно. Сжимаются только типы из content_types (префиксы).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        content_types: Sequence[str] = ("application/json",),
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = tuple(content_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding, send).run(scope, receive)
+
+    @staticmethod
+    def _choose_encoding(accept_encoding: str) -> Optional[str]:
+        accepted, refused = set(), set()
+        for item in accept_encoding.lower().split(","):
+            coding, _, params = item.partition(";")
+            name, _, quality = params.strip().partition("=")
+            try:
+                weight = float(quality) if name.strip() == "q" else 1.0
+            except ValueError:
+                continue
+            (accepted if weight > 0 else refused).add(coding.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        # "*" разрешает только кодировки, не запрещенные явно (gzip;q=0)
+        if "gzip" in accepted or ("*" in accepted and "gzip" not in refused):
+            return "gzip"
+        return None
+
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    def compressible(self, headers: Headers) -> bool:
+        content_type = headers.get("content-type", "").lower()
+        return "content-encoding" not in headers and content_type.startswith(self.content_types)
+
+
+class _CompressedResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Заголовки отправляются вместе с первым фрагментом тела, когда известен его размер
+            message.setdefault("headers", [])
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = message["status"] in (204, 304) or not self.middleware.compressible(headers)
+            if not self.passthrough:
+                MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if self.passthrough or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.encoder = self.middleware.encoder(self.encoding)
+            headers = MutableHeaders(scope=start)
+            headers["Content-Encoding"] = self.encoding
+            # Сжатое представление отличается от исходного: сильный ETag должен отличаться тоже
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], self.encoding)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(start)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+        chunk = self.encoder.process(body) if more_body else self.encoder.finish(body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,91 @@
+import hashlib
+from datetime import date
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Depends, Request, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Ответ с ETag клиент может хранить, но обязан перепроверять
+CACHE_CONTROL = "private, no-cache"
+
+
+class NotModified(Exception):
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+async def not_modified_handler(request: Request, e: NotModified) -> Response:
+    return Response(status_code=304, headers={"ETag": e.etag, "Cache-Control": CACHE_CONTROL})
+
+
+# Суффиксы ETag сжатых представлений (см. apps.core.compression)
+CONTENT_ENCODINGS = ("gzip", "br")
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """'"abc"' -> '"abc-gzip"' (W/-префикс сохраняется)"""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def _matching_etag(if_none_match: str, etag: str) -> Optional[str]:
+    """Совпавший кандидат из If-None-Match (слабое сравнение, как требует RFC 9110)"""
+    for candidate in (candidate.strip() for candidate in if_none_match.split(",")):
+        if candidate == "*":
+            return etag
+        opaque = candidate.removeprefix("W/")
+        if opaque == etag or opaque in (encoded_etag(etag, encoding) for encoding in CONTENT_ENCODINGS):
+            return opaque
+    return None
+
+
+def conditional_get(version_dependency: Callable[..., Awaitable[Optional[str]]]):
+    """Зависимость для GET-эндпоинтов: ETag из версии данных, 304 без выполнения эндпоинта.
+
+    version_dependency - FastAPI-зависимость, возвращающая дешевую версию данных
+    (None - ETag не используется). В ETag также входят путь, query и текущая дата:
+    ответы с виртуальными pending-днями зависят от дня.
+
+        @router.get("/", dependencies=[Depends(conditional_get(data_version))])
+    """
+
+    async def check_etag(request: Request, version: Optional[str] = Depends(version_dependency)) -> None:
+        if version is None:
+            return
+        source = f"{version}|{request.url.path}?{request.url.query}|{date.today().isoformat()}"
+        etag = f'"{hashlib.sha256(source.encode()).hexdigest()[:32]}"'
+        if_none_match = request.headers.get("if-none-match")
+        matched = _matching_etag(if_none_match, etag) if if_none_match else None
+        if matched:
+            # 304 повторяет ETag представления, которое есть у клиента (в т.ч. сжатого)
+            raise NotModified(matched)
+        # Заголовок добавляет ETagMiddleware: эндпоинты могут возвращать Response напрямую
+        request.state.etag = etag
+
+    return check_etag
+
+
+class ETagMiddleware:
+    """Добавляет ETag, вычисленный conditional_get, к успешному ответу"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Общий словарь request.state для эндпоинта и middleware
+        state = scope.setdefault("state", {})
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                etag = state.get("etag")
+                if etag:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"etag", etag.encode("latin-1")),
+                        (b"cache-control", CACHE_CONTROL.encode("latin-1")),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
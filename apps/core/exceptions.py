@@ -4,3 +4,8 @@ from fastapi import HTTPException
 class NotFoundException(HTTPException):
     def __init__(self, detail: str = "Not found"):
         super().__init__(status_code=404, detail=detail)
+
+
+class BadRequestException(HTTPException):
+    def __init__(self, detail: str = "Bad request"):
+        super().__init__(status_code=400, detail=detail)
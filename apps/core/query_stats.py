@@ -0,0 +1,113 @@
+"""Счетчик SQL-запросов и времени БД на запрос: Server-Timing, access-лог, предупреждение о N+1.
+
+Обработчики событий engine регистрируются только при QUERY_STATS_ENABLED,
+в выключенном состоянии накладных расходов нет.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("apps.query_stats")
+
+_PARAMS_RE = re.compile(r"\$\d+(?:\s*,\s*\$\d+)*")
+_SPACES_RE = re.compile(r"\s+")
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def add(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+
+# Статистика текущего HTTP-запроса; SQLAlchemy переносит контекст в greenlet драйвера
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def fingerprint(statement: str, max_length: int = 200) -> str:
+    """Нормализованный текст запроса: без переносов строк, списки параметров свернуты в ?"""
+    normalized = _PARAMS_RE.sub("?", _SPACES_RE.sub(" ", statement).strip())
+    return normalized[:max_length]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_stats_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is not None and conn.info.get("query_stats_started"):
+        stats.add(statement, time.perf_counter() - conn.info["query_stats_started"].pop())
+
+
+def install_query_stats(engine: AsyncEngine) -> None:
+    """Подписка на события выполнения запросов engine"""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """Server-Timing (db, app) и строка лога с числом запросов и временем БД"""
+
+    def __init__(self, app: ASGIApp, warning_threshold: int = 20, top_statements: int = 5):
+        self.app = app
+        self.warning_threshold = warning_threshold
+        self.top_statements = top_statements
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", app;dur={elapsed_ms:.2f}',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            self._log(scope, status_code, stats, time.perf_counter() - started)
+
+    def _log(self, scope: Scope, status_code: int, stats: QueryStats, elapsed: float) -> None:
+        route = scope.get("route")
+        route_path = getattr(route, "path", None) or scope["path"]
+        logger.info(
+            "%s %s %s queries=%d db=%.2fms total=%.2fms",
+            scope["method"], route_path, status_code, stats.count, stats.duration * 1000, elapsed * 1000,
+        )
+        if self.warning_threshold and stats.count > self.warning_threshold:
+            statements = "\n".join(
+                f"  {count}x {statement}" for statement, count in stats.fingerprints.most_common(self.top_statements)
+            )
+            logger.warning(
+                "%s %s executed %d queries (threshold %d):\n%s",
+                scope["method"], route_path, stats.count, self.warning_threshold, statements,
+            )
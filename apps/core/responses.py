@@ -1,5 +1,28 @@
+from typing import Any
+
 from fastapi import status
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson не обязателен
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ без повторной валидации и jsonable_encoder.
+
+    Pydantic-модель сериализуется один раз через model_dump_json (by_alias, как
+    response_model в FastAPI), остальные данные - через orjson, если он установлен.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json(by_alias=True).encode("utf-8")
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return super().render(content)
 
 
 def error_response(code: str, message: str, details=None, status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR):
@@ -1,7 +1,13 @@
 from fastapi import FastAPI
 
+from apps.core.compression import CompressionMiddleware
 from apps.core.config import settings
+from apps.core.etag import ETagMiddleware
+from apps.core.query_stats import QueryStatsMiddleware, install_query_stats
+from apps.core.responses import FastJSONResponse
 from apps.core.routers import api_router_v1
+from apps.database import engine, read_engine
+from apps.database.read_your_writes import ReadYourWritesMiddleware
 
 
 def create_app() -> FastAPI:
@@ -11,6 +17,7 @@ def create_app() -> FastAPI:
         docs_url=None if settings.is_prod() else "/docs",
         redoc_url=None if settings.is_prod() else "/redoc",
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        default_response_class=FastJSONResponse,
     )
     setup_routers(app)
     setup_middlewares(app)
@@ -22,4 +29,21 @@ def setup_routers(app: FastAPI) -> None:
 
 
 def setup_middlewares(app: FastAPI) -> None:
-    pass
+    app.add_middleware(ETagMiddleware)
+    if settings.DATABASE_READ_URL:
+        # Токен окна read-your-writes нужен только при чтениях с реплики
+        app.add_middleware(ReadYourWritesMiddleware)
+    # Снаружи ETagMiddleware: сжатие видит итоговые заголовки, включая ETag
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            content_types=settings.COMPRESSION_CONTENT_TYPES,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        )
+    if settings.QUERY_STATS_ENABLED:
+        # Повторная подписка того же engine (без реплики) игнорируется
+        for db_engine in (engine, read_engine):
+            install_query_stats(db_engine)
+        app.add_middleware(QueryStatsMiddleware, warning_threshold=settings.QUERY_COUNT_WARNING_THRESHOLD)
@@ -1,24 +1,55 @@
+from typing import Dict
+
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from apps.core.config import settings
+from apps.database.pool import engine_options
+from apps.database.read_your_writes import COOKIE_NAME, HEADER_NAME, reads_from_primary, scope_profile_id
 
 Base = declarative_base()
-engine = create_async_engine(
-    str(settings.DATABASE_URL),
-    pool_size=5,
-    max_overflow=4,
-    # pool_pre_ping=True,
-    echo=settings.LOGGING_LEVEL == "DEBUG",
+engine = create_async_engine(str(settings.DATABASE_URL), **engine_options())
+# Без DATABASE_READ_URL чтения идут в основную базу
+read_engine = (
+    create_async_engine(str(settings.DATABASE_READ_URL), **engine_options())
+    if settings.DATABASE_READ_URL
+    else engine
 )
 async_session = sessionmaker(
     bind=engine,
     expire_on_commit=False,
     class_=AsyncSession,
 )
+read_session = sessionmaker(
+    bind=read_engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+)
+
+
+def pool_stats() -> Dict[str, dict]:
+    stats = {"primary": engine.pool.stats()}
+    if read_engine is not engine:
+        stats["read"] = read_engine.pool.stats()
+    return stats
 
 
 async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """Сессия для read-only эндпоинтов: реплика, кроме короткого окна после записи профиля.
+
+    Профиль берется из request.state, поэтому зависимость объявляется после
+    get_current_active_profile. Окно read-your-writes приходит от клиента подписанным
+    токеном (см. apps.database.read_your_writes), поэтому работает при любом числе воркеров.
+    """
+    token = request.cookies.get(COOKIE_NAME) or request.headers.get(HEADER_NAME)
+    primary = reads_from_primary(token, scope_profile_id(request.scope))
+    factory = async_session if primary else read_session
+    async with factory() as session:
+        yield session
@@ -0,0 +1,35 @@
+"""archive horizon
+
+Revision ID: 7c3e5a9d2f10
+Revises: d81f3a6c0b47
+Create Date: 2026-10-18 20:31:16.487203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5a9d2f10'
+down_revision: Union[str, None] = 'd81f3a6c0b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Заполняет `python -m apps.habits.partitions archive` перед отсоединением партиций
+    op.add_column('habits', sa.Column('archived_before', sa.Date(), nullable=True))
+    op.add_column('habits', sa.Column('archived_current_streak', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habits', sa.Column('archived_longest_streak', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habits', sa.Column('archived_last_done_date', sa.Date(), nullable=True))
+    op.add_column('profile_data_versions', sa.Column('archived_before', sa.Date(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('profile_data_versions', 'archived_before')
+    op.drop_column('habits', 'archived_last_done_date')
+    op.drop_column('habits', 'archived_longest_streak')
+    op.drop_column('habits', 'archived_current_streak')
+    op.drop_column('habits', 'archived_before')
@@ -0,0 +1,41 @@
+"""habit history keyset index
+
+Revision ID: 9a4c1e7f2b58
+Revises: e6a0b73c2f91
+Create Date: 2026-10-18 16:27:44.381205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c1e7f2b58'
+down_revision: Union[str, None] = 'e6a0b73c2f91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Ключ (habit_id, date DESC, id DESC) покрывает и keyset-пагинацию истории,
+    # и поиск последнего экземпляра, поэтому прежний индекс больше не нужен.
+    # CONCURRENTLY для партиционированной таблицы не поддерживается.
+    op.create_index(
+        'ix_habitinstances_habit_id_date_id',
+        'habitinstances',
+        ['habit_id', sa.text('date DESC'), sa.text('id DESC')],
+        postgresql_include=['status'],
+    )
+    op.drop_index('ix_habitinstances_habit_id_date', table_name='habitinstances')
+
+
+def downgrade() -> None:
+    op.create_index(
+        'ix_habitinstances_habit_id_date',
+        'habitinstances',
+        ['habit_id', sa.text('date DESC')],
+        postgresql_include=['status'],
+    )
+    op.drop_index('ix_habitinstances_habit_id_date_id', table_name='habitinstances')
@@ -0,0 +1,73 @@
+"""habit streaks
+
+Revision ID: 2b7d9f4a6c31
+Revises: 9a4c1e7f2b58
+Create Date: 2026-10-18 17:05:12.508316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7d9f4a6c31'
+down_revision: Union[str, None] = '9a4c1e7f2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('habits', sa.Column('current_streak', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habits', sa.Column('longest_streak', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habits', sa.Column('last_done_date', sa.Date(), nullable=True))
+    # Начальное заполнение; то же самое делает `python -m apps.habits.streaks rebuild`
+    op.execute(
+        """
+        WITH scheduled AS (
+            SELECT h.id AS habit_id,
+                   d.day::date AS day,
+                   row_number() OVER (PARTITION BY h.id ORDER BY d.day) AS ordinal
+            FROM habits h
+            CROSS JOIN LATERAL generate_series(
+                h.start_date, coalesce(h.end_date, current_date), interval '1 day'
+            ) AS d(day)
+            WHERE (h.days_mask >> (extract(isodow FROM d.day)::int - 1)) & 1 = 1
+        ),
+        done_days AS (
+            SELECT s.habit_id,
+                   s.day,
+                   s.ordinal - row_number() OVER (PARTITION BY s.habit_id ORDER BY s.day) AS island
+            FROM scheduled s
+            JOIN habitinstances i ON i.habit_id = s.habit_id AND i.date = s.day AND i.status = 'done'
+        ),
+        islands AS (
+            SELECT habit_id,
+                   count(*) AS length,
+                   max(day) AS last_day,
+                   row_number() OVER (PARTITION BY habit_id ORDER BY max(day) DESC) AS recency
+            FROM done_days
+            GROUP BY habit_id, island
+        )
+        UPDATE habits
+        SET current_streak = s.current_streak,
+            longest_streak = s.longest_streak,
+            last_done_date = s.last_done_date
+        FROM (
+            SELECT habit_id,
+                   max(length) FILTER (WHERE recency = 1) AS current_streak,
+                   max(length) AS longest_streak,
+                   max(last_day) AS last_done_date
+            FROM islands
+            GROUP BY habit_id
+        ) AS s
+        WHERE habits.id = s.habit_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('habits', 'last_done_date')
+    op.drop_column('habits', 'longest_streak')
+    op.drop_column('habits', 'current_streak')
@@ -0,0 +1,51 @@
+"""habits days mask
+
+Revision ID: 8b1e5d0c4a27
+Revises: 3f9c2a7d1b64
+Create Date: 2026-10-18 11:03:17.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e5d0c4a27'
+down_revision: Union[str, None] = '3f9c2a7d1b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('habits', sa.Column('days_mask', sa.SmallInteger(), nullable=True))
+    op.execute(
+        """
+        UPDATE habits
+        SET days_mask = (
+            SELECT coalesce(sum(DISTINCT 1 << day::int), 0)
+            FROM unnest(days_of_week) AS day
+        )
+        """
+    )
+    op.alter_column('habits', 'days_mask', nullable=False)
+    op.create_check_constraint('ck_habits_days_mask', 'habits', 'days_mask BETWEEN 0 AND 127')
+    op.drop_column('habits', 'days_of_week')
+
+
+def downgrade() -> None:
+    op.add_column('habits', sa.Column('days_of_week', sa.ARRAY(sa.String()), nullable=True))
+    op.execute(
+        """
+        UPDATE habits
+        SET days_of_week = ARRAY(
+            SELECT day::text
+            FROM generate_series(0, 6) AS day
+            WHERE days_mask & (1 << day) <> 0
+        )
+        """
+    )
+    op.alter_column('habits', 'days_of_week', nullable=False)
+    op.drop_constraint('ck_habits_days_mask', 'habits', type_='check')
+    op.drop_column('habits', 'days_mask')
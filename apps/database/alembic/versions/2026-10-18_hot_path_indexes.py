@@ -0,0 +1,81 @@
+"""hot path indexes
+
+Revision ID: c47a9e13f5d8
+Revises: 8b1e5d0c4a27
+Create Date: 2026-10-18 11:48:05.930417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a9e13f5d8'
+down_revision: Union[str, None] = '8b1e5d0c4a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_habits_profile_id_is_active',
+            'habits',
+            ['profile_id', 'is_active'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_habits_active_schedule',
+            'habits',
+            ['profile_id', 'start_date', 'end_date', 'days_mask'],
+            postgresql_where=sa.text('is_active'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_habitinstances_habit_id_date',
+            'habitinstances',
+            ['habit_id', sa.text('date DESC')],
+            postgresql_include=['status'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_habits_name',
+            table_name='habits',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_habits_name',
+            'habits',
+            ['name'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_habitinstances_habit_id_date',
+            table_name='habitinstances',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_habits_active_schedule',
+            table_name='habits',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_habits_profile_id_is_active',
+            table_name='habits',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
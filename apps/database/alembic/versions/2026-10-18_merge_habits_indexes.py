@@ -0,0 +1,69 @@
+"""merge habits indexes
+
+Revision ID: 4e8b2d6f1a93
+Revises: 7c3e5a9d2f10
+Create Date: 2026-10-18 21:14:52.730618
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b2d6f1a93'
+down_revision: Union[str, None] = '7c3e5a9d2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ix_habits_profile_id_is_active - префикс нового индекса и по стоимости
+    # выигрывал у частичного ix_habits_active_schedule; оставляем один индекс.
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_habits_profile_schedule',
+            'habits',
+            ['profile_id', 'is_active', 'start_date', 'end_date', 'days_mask'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_habits_active_schedule',
+            table_name='habits',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_habits_profile_id_is_active',
+            table_name='habits',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_habits_profile_id_is_active',
+            'habits',
+            ['profile_id', 'is_active'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_habits_active_schedule',
+            'habits',
+            ['profile_id', 'start_date', 'end_date', 'days_mask'],
+            postgresql_where=sa.text('is_active'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_habits_profile_schedule',
+            table_name='habits',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
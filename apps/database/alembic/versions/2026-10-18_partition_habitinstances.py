@@ -0,0 +1,125 @@
+"""partition habitinstances by month
+
+Revision ID: e6a0b73c2f91
+Revises: 5d2f8b6e9a13
+Create Date: 2026-10-18 15:41:09.662035
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a0b73c2f91'
+down_revision: Union[str, None] = '5d2f8b6e9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько месяцев вперед создавать партиции; дальше их поддерживает
+# `python -m apps.habits.partitions maintain`
+MONTHS_AHEAD = 3
+
+
+def upgrade() -> None:
+    # Освобождаем имена индексов/ограничений для новой таблицы
+    op.execute("ALTER TABLE habitinstances RENAME TO habitinstances_legacy")
+    op.execute("ALTER TABLE habitinstances_legacy RENAME CONSTRAINT habitinstances_pkey TO habitinstances_legacy_pkey")
+    op.execute("ALTER TABLE habitinstances_legacy RENAME CONSTRAINT uq_habit_date TO uq_habit_date_legacy")
+    op.execute("ALTER INDEX ix_habitinstances_habit_id_date RENAME TO ix_habitinstances_legacy_habit_id_date")
+
+    # Ключ партиционирования (date) входит в PK и в uq_habit_date
+    op.execute(
+        """
+        CREATE TABLE habitinstances (
+            id INTEGER NOT NULL DEFAULT nextval('habitinstances_id_seq'),
+            habit_id INTEGER NOT NULL REFERENCES habits (id) ON DELETE CASCADE,
+            date DATE NOT NULL,
+            status habitstatus NOT NULL,
+            reason TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT habitinstances_pkey PRIMARY KEY (id, date),
+            CONSTRAINT uq_habit_date UNIQUE (habit_id, date)
+        ) PARTITION BY RANGE (date)
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_habitinstances_habit_id_date
+        ON habitinstances (habit_id, date DESC) INCLUDE (status)
+        """
+    )
+    op.execute("CREATE TABLE habitinstances_default PARTITION OF habitinstances DEFAULT")
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month_start date;
+            last_month date;
+        BEGIN
+            SELECT date_trunc('month', coalesce(min(date), current_date))::date
+            INTO month_start
+            FROM habitinstances_legacy;
+            last_month := (date_trunc('month', current_date) + interval '{MONTHS_AHEAD} months')::date;
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF habitinstances FOR VALUES FROM (%L) TO (%L)',
+                    'habitinstances_p' || to_char(month_start, 'YYYYMM'),
+                    month_start,
+                    (month_start + interval '1 month')::date
+                );
+                month_start := (month_start + interval '1 month')::date;
+            END LOOP;
+        END $$
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO habitinstances (id, habit_id, date, status, reason, created_at, updated_at)
+        SELECT id, habit_id, date, status, reason, created_at, updated_at
+        FROM habitinstances_legacy
+        """
+    )
+    op.execute("ALTER SEQUENCE habitinstances_id_seq OWNED BY habitinstances.id")
+    op.execute("DROP TABLE habitinstances_legacy")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE habitinstances RENAME TO habitinstances_partitioned")
+    op.execute(
+        "ALTER TABLE habitinstances_partitioned "
+        "RENAME CONSTRAINT habitinstances_pkey TO habitinstances_partitioned_pkey"
+    )
+    op.execute("ALTER TABLE habitinstances_partitioned RENAME CONSTRAINT uq_habit_date TO uq_habit_date_partitioned")
+    op.execute("ALTER INDEX ix_habitinstances_habit_id_date RENAME TO ix_habitinstances_partitioned_habit_id_date")
+    op.execute(
+        """
+        CREATE TABLE habitinstances (
+            id INTEGER NOT NULL DEFAULT nextval('habitinstances_id_seq'),
+            habit_id INTEGER NOT NULL REFERENCES habits (id) ON DELETE CASCADE,
+            date DATE NOT NULL,
+            status habitstatus NOT NULL,
+            reason TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT habitinstances_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_habit_date UNIQUE (habit_id, date)
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_habitinstances_habit_id_date
+        ON habitinstances (habit_id, date DESC) INCLUDE (status)
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO habitinstances (id, habit_id, date, status, reason, created_at, updated_at)
+        SELECT id, habit_id, date, status, reason, created_at, updated_at
+        FROM habitinstances_partitioned
+        """
+    )
+    op.execute("ALTER SEQUENCE habitinstances_id_seq OWNED BY habitinstances.id")
+    op.execute("DROP TABLE habitinstances_partitioned")
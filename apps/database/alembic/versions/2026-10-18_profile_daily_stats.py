@@ -0,0 +1,57 @@
+"""profile daily stats
+
+Revision ID: 5d2f8b6e9a13
+Revises: c47a9e13f5d8
+Create Date: 2026-10-18 13:20:52.114870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8b6e9a13'
+down_revision: Union[str, None] = 'c47a9e13f5d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('profile_daily_stats',
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('total_habits', sa.Integer(), nullable=False),
+    sa.Column('completed_habits', sa.Integer(), nullable=False),
+    sa.Column('skipped_habits', sa.Integer(), nullable=False),
+    sa.Column('pending_habits', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['profile_id'], ['profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('profile_id', 'date')
+    )
+    # Начальное заполнение; то же самое делает `python -m apps.habits.rollups rebuild`
+    op.execute(
+        """
+        INSERT INTO profile_daily_stats (
+            profile_id, date, total_habits, completed_habits, skipped_habits, pending_habits, updated_at
+        )
+        SELECT h.profile_id,
+               d.day::date,
+               count(*),
+               count(*) FILTER (WHERE i.status = 'done'),
+               count(*) FILTER (WHERE i.status = 'skipped'),
+               count(*) FILTER (WHERE i.status IS NULL OR i.status NOT IN ('done', 'skipped')),
+               now() AT TIME ZONE 'utc'
+        FROM habits h
+        CROSS JOIN LATERAL generate_series(h.start_date, h.end_date, interval '1 day') AS d(day)
+        LEFT JOIN habitinstances i ON i.habit_id = h.id AND i.date = d.day::date
+        WHERE h.is_active
+          AND h.end_date IS NOT NULL
+        GROUP BY h.profile_id, d.day::date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('profile_daily_stats')
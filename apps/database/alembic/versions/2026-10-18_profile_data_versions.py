@@ -0,0 +1,32 @@
+"""profile data versions
+
+Revision ID: d81f3a6c0b47
+Revises: 2b7d9f4a6c31
+Create Date: 2026-10-18 19:42:37.061924
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f3a6c0b47'
+down_revision: Union[str, None] = '2b7d9f4a6c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Строки нет - версия 0; первая запись профиля вставляет строку (apps.habits.versions)
+    op.create_table('profile_data_versions',
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['profile_id'], ['profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('profile_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('profile_data_versions')
@@ -0,0 +1,37 @@
+"""prune pending instances
+
+Revision ID: 3f9c2a7d1b64
+Revises: ed491fe044ce
+Create Date: 2026-10-18 10:12:41.208114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d1b64'
+down_revision: Union[str, None] = 'ed491fe044ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pending-экземпляры теперь вычисляются из расписания привычки
+    op.execute("DELETE FROM habitinstances WHERE status = 'pending'")
+
+
+def downgrade() -> None:
+    # Восстанавливаем pending-строки для всех запланированных дней без отметки
+    op.execute(
+        """
+        INSERT INTO habitinstances (habit_id, date, status, created_at, updated_at)
+        SELECT h.id, d.day::date, 'pending', now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+        FROM habits h
+        CROSS JOIN LATERAL generate_series(h.start_date, h.end_date, interval '1 day') AS d(day)
+        WHERE h.end_date IS NOT NULL
+          AND (extract(isodow FROM d.day)::int - 1)::text = ANY(h.days_of_week)
+        ON CONFLICT ON CONSTRAINT uq_habit_date DO NOTHING
+        """
+    )
@@ -0,0 +1,71 @@
+import time
+from typing import Any, Dict
+from uuid import uuid4
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from apps.core.config import settings
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """QueuePool со счетчиками ожидания соединений и таймаутов (для /healthcheck/stats)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def connect(self):
+        # Время checkout целиком: _do_get рекурсивно повторяет попытку при гонке за overflow,
+        # поэтому замер в нем посчитал бы одно ожидание несколько раз
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_time_avg_ms": round(self.wait_time_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+        }
+
+
+def engine_options() -> Dict[str, Any]:
+    """Параметры create_async_engine из Config"""
+    connect_args: Dict[str, Any] = {}
+    if settings.DB_PGBOUNCER_TRANSACTION_MODE:
+        # Пулер в режиме transaction не сохраняет prepared statements между транзакциями:
+        # отключаем кеши asyncpg и SQLAlchemy и делаем имена statement уникальными
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+    else:
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+        echo=settings.LOGGING_LEVEL == "DEBUG",
+    )
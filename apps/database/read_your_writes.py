@@ -0,0 +1,83 @@
+"""Read-your-writes между воркерами: окно чтений из основной базы после записи профиля.
+
+Окно не хранится в процессе: после успешной записи клиент получает подписанный
+токен "profile_id:until:signature" в cookie и в заголовке ответа и возвращает его
+(cookie или тот же заголовок) в следующих запросах. Любой воркер проверяет подпись
+SECRET_KEY и срок until (время Unix в миллисекундах), поэтому чтение сразу после
+записи не уйдет на отстающую реплику, даже если его обслужит другой процесс.
+"""
+import hashlib
+import hmac
+import math
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from apps.core.config import settings
+
+COOKIE_NAME = "primary_reads_until"
+HEADER_NAME = "X-Primary-Reads-Until"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def scope_profile_id(scope: Scope) -> Optional[int]:
+    """Профиль запроса: из зависимости авторизации или из пути /profile/{profile_id}"""
+    profile_id = scope.get("state", {}).get("profile_id") or scope.get("path_params", {}).get("profile_id")
+    return int(profile_id) if profile_id is not None else None
+
+
+def _signature(profile_id: int, until: int) -> str:
+    key = settings.SECRET_KEY.get_secret_value().encode()
+    return hmac.new(key, f"{profile_id}:{until}".encode(), hashlib.sha256).hexdigest()
+
+
+def issue_token(profile_id: int, now: Optional[float] = None) -> str:
+    now = time.time() if now is None else now
+    until = int((now + settings.READ_YOUR_WRITES_SECONDS) * 1000)
+    return f"{profile_id}:{until}:{_signature(profile_id, until)}"
+
+
+def reads_from_primary(token: Optional[str], profile_id: Optional[int], now: Optional[float] = None) -> bool:
+    """Токен подписан, выдан этому профилю и еще не истек"""
+    if not token or profile_id is None:
+        return False
+    try:
+        token_profile_id, until, signature = token.split(":")
+        token_profile_id, until = int(token_profile_id), int(until)
+    except ValueError:
+        return False
+    if token_profile_id != profile_id or not hmac.compare_digest(signature, _signature(profile_id, until)):
+        return False
+    now = time.time() if now is None else now
+    return until > now * 1000
+
+
+class ReadYourWritesMiddleware:
+    """Выдает токен окна read-your-writes в ответ на успешную запись профиля"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+        # Общий словарь request.state: профиль в него кладет get_current_active_profile
+        scope.setdefault("state", {})
+
+        async def send_with_token(message: Message) -> None:
+            if message["type"] == "http.response.start" and 200 <= message["status"] < 300:
+                profile_id = scope_profile_id(scope)
+                if profile_id is not None:
+                    token = issue_token(profile_id)
+                    max_age = math.ceil(settings.READ_YOUR_WRITES_SECONDS)
+                    cookie = f"{COOKIE_NAME}={token}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"set-cookie", cookie.encode("latin-1")),
+                        (HEADER_NAME.lower().encode("latin-1"), token.encode("latin-1")),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_token)
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Sequence
 
 from sqlalchemy import delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -28,15 +28,36 @@ class AbstractRepository(ABC):
 
 
 class BaseRepository(AbstractRepository):
+    """CRUD поверх RETURNING: записи не требуют повторного чтения для ответа.
+
+    returning - проекция (колонки/выражения) вместо целой модели, тогда возвращается Row.
+    commit=False - запись остается в текущей транзакции, commit делает вызывающий.
+    """
+
     def __init__(self, model, session: AsyncSession):
         self.model = model
         self.session = session
 
-    async def add_one(self, data: dict):
-        stmt = insert(self.model).values(**data).returning(self.model)
+    def _where(self, stmt, model_id: int, filters: Optional[Dict[str, Any]] = None):
+        stmt = stmt.where(self.model.id == model_id)
+        for field, value in (filters or {}).items():
+            stmt = stmt.where(getattr(self.model, field) == value)
+        return stmt
+
+    async def _execute_returning(self, stmt, returning: Optional[Sequence[Any]], commit: bool):
+        if returning is None:
+            stmt = stmt.returning(self.model)
+        else:
+            stmt = stmt.returning(*returning)
         res = await self.session.execute(stmt)
-        await self.session.commit()
-        return res.scalar_one()
+        row = res.scalar_one_or_none() if returning is None else res.one_or_none()
+        if commit:
+            await self.session.commit()
+        return row
+
+    async def add_one(self, data: dict, returning: Optional[Sequence[Any]] = None, commit: bool = True):
+        stmt = insert(self.model).values(**data)
+        return await self._execute_returning(stmt, returning, commit)
 
     async def find_all(self, filters: Dict[str, Any] = None):
         stmt = select(self.model)
@@ -53,19 +74,33 @@ class BaseRepository(AbstractRepository):
         res = await self.session.execute(stmt)
         return res.scalar_one_or_none()
 
-    async def update_one(self, model_id: int, data: Dict[str, Any]):
-        stmt = (
-            update(self.model)
-            .where(self.model.id == model_id)
-            .values(**data)
-            .returning(self.model)
-        )
-        res = await self.session.execute(stmt)
-        await self.session.commit()
-        return res.scalar_one_or_none()
-
-    async def delete_one(self, model_id: int):
-        stmt = delete(self.model).where(self.model.id == model_id)
+    async def update_one(
+        self,
+        model_id: int,
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        returning: Optional[Sequence[Any]] = None,
+        commit: bool = True,
+        where: Sequence[Any] = (),
+    ):
+        """where - дополнительные SQL-условия (например, UPDATE ... FROM по алиасу)"""
+        stmt = self._where(update(self.model), model_id, filters).where(*where).values(**data)
+        stmt = stmt.execution_options(synchronize_session=False)
+        return await self._execute_returning(stmt, returning, commit)
+
+    async def delete_one(
+        self,
+        model_id: int,
+        filters: Optional[Dict[str, Any]] = None,
+        returning: Optional[Sequence[Any]] = None,
+        commit: bool = True,
+    ):
+        """Без returning возвращает bool, с returning - Row удаленной записи или None"""
+        stmt = self._where(delete(self.model), model_id, filters)
+        stmt = stmt.execution_options(synchronize_session=False)
+        if returning is not None:
+            return await self._execute_returning(stmt, returning, commit)
         res = await self.session.execute(stmt)
-        await self.session.commit()
+        if commit:
+            await self.session.commit()
         return res.rowcount > 0
@@ -1,12 +1,15 @@
 import enum
 from datetime import date, datetime
-from sqlalchemy import ForeignKey, Integer, String, Date, UniqueConstraint, Enum, Text, DateTime
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import (
+    CheckConstraint, ColumnElement, ForeignKey, Integer, SmallInteger, String, Date, UniqueConstraint, Enum, Text,
+    BigInteger, DateTime, Index, and_, cast, func, or_, text,
+)
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import List, Optional
 
 from apps.database import Base
+from apps.habits.schedule import days_to_mask, mask_to_days, masks_with_weekday
 
 
 class HabitStatus(enum.Enum):
@@ -19,9 +22,11 @@ class HabitStatus(enum.Enum):
 class HabitInstance(Base):
     __tablename__ = 'habitinstances'
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Составной PK: без autoincrement=True SQLAlchemy не создает для id последовательность
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     habit_id: Mapped[int] = mapped_column(Integer, ForeignKey('habits.id', ondelete='CASCADE'), nullable=False)
-    date: Mapped[Date] = mapped_column(Date, nullable=False)
+    # Входит в PK: таблица партиционирована по месяцам на date
+    date: Mapped[Date] = mapped_column(Date, primary_key=True)
     status: Mapped[HabitStatus] = mapped_column(Enum(HabitStatus), default=HabitStatus.pending, nullable=False)
     reason: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Причина пропуска или удаления
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -31,6 +36,11 @@ class HabitInstance(Base):
 
     __table_args__ = (
         UniqueConstraint('habit_id', 'date', name='uq_habit_date'),
+        Index(
+            'ix_habitinstances_habit_id_date_id', 'habit_id', text('date DESC'), text('id DESC'),
+            postgresql_include=['status'],
+        ),
+        {'postgresql_partition_by': 'RANGE (date)'},
     )
 
 
@@ -38,16 +48,86 @@ class Habit(Base):
     __tablename__ = 'habits'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    name: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     duration_days: Mapped[int] = mapped_column(Integer, nullable=False)
-    days_of_week: Mapped[List[str]] = mapped_column(ARRAY(String), nullable=False)  # ["1", "3", "5"] для Пн, Ср, Пт
+    days_mask: Mapped[int] = mapped_column(SmallInteger, nullable=False)  # 0b0101010 для Пн, Ср, Пт (бит N = день N)
     start_date: Mapped[Date] = mapped_column(Date, nullable=False)
     end_date: Mapped[Optional[Date]] = mapped_column(Date, nullable=True)  # Дата окончания привычки
     is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
+    # Серия, закончившаяся в last_done_date
+    current_streak: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    longest_streak: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    # Последний выполненный запланированный день
+    last_done_date: Mapped[Optional[Date]] = mapped_column(Date, nullable=True)
+    # Серии на момент архивации отметок до archived_before (затравка пересчета, см. streaks.py)
+    archived_before: Mapped[Optional[Date]] = mapped_column(Date, nullable=True)
+    archived_current_streak: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    archived_longest_streak: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    archived_last_done_date: Mapped[Optional[Date]] = mapped_column(Date, nullable=True)
     profile_id: Mapped[int] = mapped_column(Integer, ForeignKey('profile.id'), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     instances: Mapped[list[HabitInstance]] = relationship("HabitInstance", cascade="all, delete-orphan", back_populates="habit")
-    profile: Mapped["Profile"] = relationship("Profile", back_populates="habits")
\ No newline at end of file
+    profile: Mapped["Profile"] = relationship("Profile", back_populates="habits")
+
+    __table_args__ = (
+        CheckConstraint('days_mask BETWEEN 0 AND 127', name='ck_habits_days_mask'),
+        # Один индекс для списков профиля (profile_id, is_active) и выборок по расписанию
+        Index('ix_habits_profile_schedule', 'profile_id', 'is_active', 'start_date', 'end_date', 'days_mask'),
+    )
+
+    @property
+    def days_of_week(self) -> List[str]:
+        return mask_to_days(self.days_mask)
+
+    @days_of_week.setter
+    def days_of_week(self, value: List[str]) -> None:
+        self.days_mask = days_to_mask(value)
+
+    @classmethod
+    def active_on(cls, day: date | ColumnElement) -> ColumnElement[bool]:
+        """SQL-условие: привычка активна и день day входит в ее диапазон (без учета дней недели)"""
+        return and_(
+            # Голая колонка: планировщик сравнивает ее с колонкой is_active индекса как is_active = true
+            cls.is_active,
+            cls.start_date <= day,
+            or_(cls.end_date.is_(None), cls.end_date >= day),
+        )
+
+    @classmethod
+    def scheduled_on(cls, day: date | ColumnElement) -> ColumnElement[bool]:
+        """SQL-условие: привычка активна и запланирована на день day (дата или SQL-выражение)"""
+        if isinstance(day, date):
+            # IN по списку масок использует обычный B-tree индекс
+            weekday_matches = cls.days_mask.in_(masks_with_weekday(day.weekday()))
+        else:
+            weekday = cast(func.extract("isodow", day), Integer) - 1
+            weekday_matches = cls.days_mask.bitwise_rshift(weekday).bitwise_and(1) == 1
+        return and_(cls.active_on(day), weekday_matches)
+
+
+class ProfileDailyStats(Base):
+    """Накопительная статистика профиля по дням (поддерживается HabitService в той же транзакции)"""
+    __tablename__ = 'profile_daily_stats'
+
+    profile_id: Mapped[int] = mapped_column(Integer, ForeignKey('profile.id', ondelete='CASCADE'), primary_key=True)
+    date: Mapped[Date] = mapped_column(Date, primary_key=True)
+    total_habits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    completed_habits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    skipped_habits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    pending_habits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+
+class ProfileDataVersion(Base):
+    """Версия данных привычек профиля: +1 в каждой транзакции записи (ETag и ключ habit_cache)"""
+    __tablename__ = 'profile_data_versions'
+
+    profile_id: Mapped[int] = mapped_column(Integer, ForeignKey('profile.id', ondelete='CASCADE'), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    # Отметки раньше этой даты архивированы: дни не отмечаются, статистика за них не пересчитывается
+    archived_before: Mapped[Optional[Date]] = mapped_column(Date, nullable=True)
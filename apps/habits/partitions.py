@@ -0,0 +1,171 @@
+"""Обслуживание помесячных партиций habitinstances.
+
+    python -m apps.habits.partitions maintain [--months-ahead 3]
+    python -m apps.habits.partitions archive --older-than-months 24 [--drop]
+
+maintain создает партиции на months_ahead месяцев вперед (строки, уже попавшие
+в DEFAULT-партицию, переносятся в новую). archive отсоединяет партиции старше
+порога и переносит их в схему habits_archive, сжимая VACUUM FULL, либо удаляет (--drop).
+
+Перед отсоединением archive замораживает данные, которые считаются из архивируемых
+отметок: серии привычек на границу архива сохраняются в habits.archived_* (затравка
+пересчета в apps.habits.streaks), а граница записывается в profile_data_versions.
+Дни раньше границы больше не отмечаются, и их profile_daily_stats не пересчитывается.
+"""
+import argparse
+import asyncio
+from datetime import date
+from typing import List
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from apps.habits.models import Habit
+from apps.habits.rollups import DailyStatsRollup
+from apps.habits.streaks import freeze_streaks_statement
+from apps.habits.versions import bump_version_statement
+
+PARENT_TABLE = "habitinstances"
+DEFAULT_PARTITION = "habitinstances_default"
+PARTITION_PREFIX = "habitinstances_p"
+ARCHIVE_SCHEMA = "habits_archive"
+
+
+def month_start(day: date, shift: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 + shift
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_month(name: str) -> date:
+    """habitinstances_p202401 -> 2024-01-01"""
+    suffix = name.removeprefix(PARTITION_PREFIX)
+    return date(int(suffix[:4]), int(suffix[4:6]), 1)
+
+
+async def list_partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+            """
+        ),
+        {"parent": PARENT_TABLE},
+    )
+    names = sorted(name for name in result.scalars() if name.startswith(PARTITION_PREFIX))
+    # Завершаем неявную транзакцию: каждая партиция обрабатывается в своей
+    await conn.commit()
+    return names
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int = 3, today: date | None = None) -> List[str]:
+    """Создание недостающих партиций с текущего месяца на months_ahead вперед"""
+    today = today or date.today()
+    existing = set(await list_partitions(conn))
+    created = []
+    for shift in range(months_ahead + 1):
+        lower, upper = month_start(today, shift), month_start(today, shift + 1)
+        name = partition_name(lower)
+        if name in existing:
+            continue
+        async with conn.begin():
+            # Нельзя создать партицию, пока пересекающиеся строки лежат в DEFAULT:
+            # создаем отдельную таблицу, переносим строки и присоединяем ее
+            await conn.execute(
+                text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            )
+            await conn.execute(
+                text(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM {DEFAULT_PARTITION}
+                        WHERE date >= :lower AND date < :upper
+                        RETURNING *
+                    )
+                    INSERT INTO {name} SELECT * FROM moved
+                    """
+                ),
+                {"lower": lower, "upper": upper},
+            )
+            await conn.execute(
+                text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+            )
+        created.append(name)
+    return created
+
+
+async def freeze_archived(conn: AsyncConnection, until: date) -> List[int]:
+    """Заморозка серий и статистики профилей по дням до until, транзакция на профиль.
+
+    Как и любая запись, берет блокировку профиля и увеличивает версию его данных.
+    Возвращает профили, у которых есть привычки, начатые раньше until.
+    """
+    result = await conn.execute(select(Habit.profile_id).where(Habit.start_date < until).distinct())
+    profile_ids = sorted(result.scalars().all())
+    await conn.commit()
+    for profile_id in profile_ids:
+        async with conn.begin():
+            lock = select(DailyStatsRollup.lock(profile_id).label("profile_lock")).cte("profile_lock")
+            await conn.execute(bump_version_statement(profile_id, lock, archived_before=until))
+            await conn.execute(freeze_streaks_statement(until, profile_id=profile_id))
+    return profile_ids
+
+
+async def archive_partitions(
+    conn: AsyncConnection, older_than_months: int, drop: bool = False, today: date | None = None
+) -> List[str]:
+    """Отсоединение партиций, целиком лежащих раньше порога, с архивацией или удалением"""
+    until = month_start(today or date.today(), -older_than_months)
+    cutoff = partition_name(until)
+    names = [name for name in await list_partitions(conn) if name < cutoff]
+    if not names:
+        return []
+    await freeze_archived(conn, until)
+    for name in names:
+        async with conn.begin():
+            await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            if drop:
+                await conn.execute(text(f"DROP TABLE {name}"))
+            else:
+                await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+                await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+    if not drop:
+        # VACUUM FULL нельзя выполнять в транзакции
+        autocommit = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name in names:
+            await autocommit.execute(text(f"VACUUM FULL {ARCHIVE_SCHEMA}.{name}"))
+    return names
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from apps import detect_models
+    from apps.database import engine
+
+    detect_models()
+    async with engine.connect() as conn:
+        if args.command == "maintain":
+            created = await ensure_partitions(conn, args.months_ahead)
+            print(f"Created partitions: {', '.join(created) or 'none'}")
+        else:
+            archived = await archive_partitions(conn, args.older_than_months, drop=args.drop)
+            action = "Dropped" if args.drop else "Archived"
+            print(f"{action} partitions: {', '.join(archived) or 'none'}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="habitinstances partition maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    maintain = subparsers.add_parser("maintain")
+    maintain.add_argument("--months-ahead", type=int, default=3)
+    archive = subparsers.add_parser("archive")
+    archive.add_argument("--older-than-months", type=int, required=True)
+    archive.add_argument("--drop", action="store_true")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,201 @@
+"""Накопительная статистика profile_daily_stats.
+
+Пересборка и проверка расхождений:
+
+    python -m apps.habits.rollups rebuild [--profile-id ID]
+    python -m apps.habits.rollups check [--profile-id ID]
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, literal, or_, select, union
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.habits.models import Habit, ProfileDailyStats
+from apps.habits.schemas.schemas import DayStatsSchema
+from apps.habits.stats import build_day_stats, calendar_stats_statement
+from apps.habits.versions import archive_horizon, bump_version_statement
+
+# Пространство ключей pg_advisory_xact_lock для пересчета статистики профиля
+ROLLUP_LOCK_NAMESPACE = 8008
+
+Counts = Tuple[int, int, int]
+
+
+class DailyStatsRollup:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @staticmethod
+    def lock(profile_id: int):
+        """Транзакционная advisory-блокировка данных профиля.
+
+        Любая транзакция записи привычек профиля берет ее первым запросом, до блокировок
+        строк habits/habitinstances: при обратном порядке две транзакции ждут друг друга.
+        """
+        return func.pg_advisory_xact_lock(ROLLUP_LOCK_NAMESPACE, profile_id)
+
+    async def acquire(self, profile_id: int) -> None:
+        """Первый запрос транзакции записи: блокировка профиля и новая версия его данных"""
+        lock = select(self.lock(profile_id).label("profile_lock")).cte("profile_lock")
+        await self.db.execute(bump_version_statement(profile_id, lock))
+
+    async def refresh(
+        self,
+        profile_id: int,
+        start_date: date,
+        end_date: Optional[date],
+        dates: Optional[Sequence[date]] = None,
+    ) -> None:
+        """Пересчет статистики профиля за период в текущей транзакции (commit делает вызывающий).
+
+        Блокировку профиля (lock) вызывающий берет в начале транзакции: пересчеты одного
+        профиля сериализуются, и запрос видит все закоммиченные отметки.
+        dates - пересчитать только эти дни периода (разреженные даты пакетной отметки).
+        Дни раньше границы архива профиля не пересчитываются: их отметки отсоединены.
+        """
+        end_date = end_date or start_date
+        if start_date > end_date:
+            return
+
+        fresh = calendar_stats_statement(profile_id, start_date, end_date, dates).subquery()
+        stmt = insert(ProfileDailyStats).from_select(
+            [
+                "profile_id",
+                "date",
+                "total_habits",
+                "completed_habits",
+                "skipped_habits",
+                "pending_habits",
+                "updated_at",
+            ],
+            select(
+                literal(profile_id),
+                fresh.c.day,
+                fresh.c.total_habits,
+                fresh.c.completed_habits,
+                fresh.c.skipped_habits,
+                fresh.c.total_habits - fresh.c.completed_habits - fresh.c.skipped_habits,
+                literal(datetime.utcnow()),
+            ).where(self._live(fresh.c.day, profile_id)),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProfileDailyStats.profile_id, ProfileDailyStats.date],
+            set_={
+                "total_habits": stmt.excluded.total_habits,
+                "completed_habits": stmt.excluded.completed_habits,
+                "skipped_habits": stmt.excluded.skipped_habits,
+                "pending_habits": stmt.excluded.pending_habits,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await self.db.execute(stmt)
+
+    async def read(self, profile_id: int, start_date: date, end_date: date) -> List[DayStatsSchema]:
+        """Статистика за период из накопительной таблицы (дни без строки - нулевые)"""
+        stored = await self._stored_counts(profile_id, start_date, end_date)
+        return [
+            build_day_stats(day, *stored.get(day, (0, 0, 0)))
+            for day in (start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1))
+        ]
+
+    async def rebuild(self, profile_id: Optional[int] = None) -> int:
+        """Полный пересчет статистики из habits/habitinstances, возвращает число профилей"""
+        profile_ids = await self._profile_ids(profile_id)
+        for pid in profile_ids:
+            await self.acquire(pid)
+            await self.db.execute(
+                delete(ProfileDailyStats).where(
+                    ProfileDailyStats.profile_id == pid, self._live(ProfileDailyStats.date, pid)
+                )
+            )
+            start_date, end_date = await self._schedule_range(pid)
+            if start_date:
+                await self.refresh(pid, start_date, end_date)
+            await self.db.commit()
+        return len(profile_ids)
+
+    async def check(self, profile_id: Optional[int] = None) -> List[Tuple[int, date, Counts, Counts]]:
+        """Поиск расхождений: (profile_id, date, сохраненные счетчики, фактические счетчики)"""
+        drift = []
+        for pid in await self._profile_ids(profile_id):
+            start_date, end_date = await self._schedule_range(pid)
+            if not start_date:
+                start_date = end_date = date.today()
+            horizon = (await self.db.execute(select(archive_horizon(pid)))).scalar()
+            stored = await self._stored_counts(pid, None, None)
+            result = await self.db.execute(calendar_stats_statement(pid, start_date, end_date))
+            actual = {
+                row.day: (row.total_habits, row.completed_habits, row.skipped_habits)
+                for row in result
+                if row.total_habits
+            }
+            # Архивные дни сверять не с чем: их отметки отсоединены
+            days = (day for day in stored.keys() | actual.keys() if horizon is None or day >= horizon)
+            for day in sorted(days):
+                stored_counts = stored.get(day, (0, 0, 0))
+                actual_counts = actual.get(day, (0, 0, 0))
+                if stored_counts != actual_counts:
+                    drift.append((pid, day, stored_counts, actual_counts))
+        return drift
+
+    @staticmethod
+    def _live(day, profile_id: int):
+        """SQL-условие: день не раньше границы архива профиля"""
+        horizon = archive_horizon(profile_id)
+        return or_(horizon.is_(None), day >= horizon)
+
+    async def _stored_counts(
+        self, profile_id: int, start_date: Optional[date], end_date: Optional[date]
+    ) -> Dict[date, Counts]:
+        stmt = select(ProfileDailyStats).where(ProfileDailyStats.profile_id == profile_id)
+        if start_date and end_date:
+            stmt = stmt.where(ProfileDailyStats.date.between(start_date, end_date))
+        result = await self.db.execute(stmt)
+        return {
+            row.date: (row.total_habits, row.completed_habits, row.skipped_habits)
+            for row in result.scalars()
+            if row.total_habits
+        }
+
+    async def _schedule_range(self, profile_id: int) -> Tuple[Optional[date], Optional[date]]:
+        result = await self.db.execute(
+            select(func.min(Habit.start_date), func.max(Habit.end_date)).where(Habit.profile_id == profile_id)
+        )
+        return tuple(result.one())
+
+    async def _profile_ids(self, profile_id: Optional[int]) -> List[int]:
+        if profile_id is not None:
+            return [profile_id]
+        result = await self.db.execute(
+            union(select(Habit.profile_id), select(ProfileDailyStats.profile_id))
+        )
+        return sorted(result.scalars().all())
+
+
+async def _main(command: str, profile_id: Optional[int]) -> None:
+    from apps import detect_models
+    from apps.database import async_session
+
+    detect_models()
+    async with async_session() as session:
+        rollup = DailyStatsRollup(session)
+        if command == "rebuild":
+            count = await rollup.rebuild(profile_id)
+            print(f"Rebuilt daily stats for {count} profile(s)")
+        else:
+            drift = await rollup.check(profile_id)
+            for pid, day, stored, actual in drift:
+                print(f"profile={pid} date={day} stored={stored} actual={actual}")
+            print(f"Found {len(drift)} drifted day(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="profile_daily_stats maintenance")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--profile-id", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(_main(args.command, args.profile_id))
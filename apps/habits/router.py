@@ -2,74 +2,135 @@ from datetime import date
 from typing import Optional
 from fastapi import APIRouter, Depends, status, Query, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from apps.database import get_db
+from apps.database import get_db, get_read_db
 from apps.auth.router import get_current_active_profile
 
 from apps.habits.schemas.schemas import (
     HabitCreateSchema,
     HabitUpdateSchema,
     HabitInstanceCreateSchema,
+    HabitInstanceBatchSchema,
     HabitStatus, HabitSchema,
 )
 from .schemas.responses import (
     HabitResponse,
     HabitListResponse,
     HabitInstanceResponse,
+    HabitInstanceBatchResponse,
     DayStatsResponse,
     DayStatsListResponse,
     HabitHistoryResponse, HabitDeleteResponse, HabitCreateResponse
 )
-from .service import HabitService
+from .service import HISTORY_PAGE_SIZE, HabitService
+from apps.core.etag import conditional_get
 from apps.core.exceptions import NotFoundException
-from apps.profile.models import Profile
+from apps.core.responses import FastJSONResponse
+from apps.auth.schema import AuthPrincipal
 
 
+# Ответы собираются через model_construct и отдаются FastJSONResponse напрямую:
+# данные сервиса уже провалидированы, response_model остается для OpenAPI
 router = APIRouter()
 
 
+async def habit_data_version(
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db)
+) -> str:
+    """Версия данных профиля для conditional GET"""
+    return await HabitService(db).data_version(current_profile.id)
+
+
+# ETag / If-None-Match: при совпадении 304 без запросов сервиса и сериализации.
+# Эндпоинты получают ту же версию (FastAPI кеширует зависимость в пределах запроса)
+# и передают ее в HabitService: тело из habit_cache соответствует ETag
+etag_dependencies = [Depends(conditional_get(habit_data_version))]
+
+
 @router.post("/", response_model=HabitResponse, status_code=status.HTTP_201_CREATED)
 async def create_habit(
     habit_data: HabitCreateSchema,
-    current_profile: Profile = Depends(get_current_active_profile),
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
     db: AsyncSession = Depends(get_db)
 ):
     """Создание новой привычки"""
     habit_service = HabitService(db)
     new_habit = await habit_service.add_one(habit_data, current_profile.id)
-    return HabitCreateResponse(data=new_habit)
+    return FastJSONResponse(HabitCreateResponse.model_construct(data=new_habit), status_code=status.HTTP_201_CREATED)
+
+
+@router.get("/history", response_model=HabitHistoryResponse, dependencies=etag_dependencies)
+async def get_profile_history(
+    status: Optional[HabitStatus] = Query(None, description="Фильтр по статусу"),
+    start_date: Optional[date] = Query(None, description="Начальная дата периода"),
+    end_date: Optional[date] = Query(None, description="Конечная дата периода"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=200, description="Размер страницы"),
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
+    data_version: str = Depends(habit_data_version)
+):
+    """История отметок всех привычек профиля (от новых к старым)"""
+    habit_service = HabitService(db, data_version)
+    history, next_cursor = await habit_service.get_history(
+        current_profile.id, None, status, start_date, end_date, cursor, limit
+    )
+    return FastJSONResponse(HabitHistoryResponse.model_construct(data=history, next_cursor=next_cursor))
 
 
-@router.get("/{habit_id}", response_model=HabitResponse)
+@router.get("/{habit_id}", response_model=HabitResponse, dependencies=etag_dependencies)
 async def get_habit(
     habit_id: int,
-    current_profile: Profile = Depends(get_current_active_profile),
-    db: AsyncSession = Depends(get_db)
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
+    data_version: str = Depends(habit_data_version)
 ):
     """Получение одной привычки"""
-    habit_service = HabitService(db)
+    habit_service = HabitService(db, data_version)
     habit = await habit_service.get_one(habit_id, current_profile.id)
     if not habit:
         raise NotFoundException("Habit not found")
-    return HabitResponse(data=habit)
+    return FastJSONResponse(HabitResponse.model_construct(data=habit))
 
 
-@router.get("/", response_model=HabitListResponse)
+@router.get("/", response_model=HabitListResponse, dependencies=etag_dependencies)
 async def get_habits(
     is_active: Optional[bool] = Query(None, description="Фильтр по активности привычек"),
-    current_profile: Profile = Depends(get_current_active_profile),
-    db: AsyncSession = Depends(get_db)
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
+    data_version: str = Depends(habit_data_version)
 ):
     """Получение всех привычек профиля"""
-    habit_service = HabitService(db)
+    habit_service = HabitService(db, data_version)
     habits = await habit_service.find_all(current_profile.id, is_active)
-    return HabitListResponse(data=habits)
+    return FastJSONResponse(HabitListResponse.model_construct(data=habits))
+
+
+@router.get("/{habit_id}/history", response_model=HabitHistoryResponse, dependencies=etag_dependencies)
+async def get_habit_history(
+    habit_id: int,
+    status: Optional[HabitStatus] = Query(None, description="Фильтр по статусу"),
+    start_date: Optional[date] = Query(None, description="Начальная дата периода"),
+    end_date: Optional[date] = Query(None, description="Конечная дата периода"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=200, description="Размер страницы"),
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
+    data_version: str = Depends(habit_data_version)
+):
+    """История отметок одной привычки (от новых к старым)"""
+    habit_service = HabitService(db, data_version)
+    history, next_cursor = await habit_service.get_history(
+        current_profile.id, habit_id, status, start_date, end_date, cursor, limit
+    )
+    return FastJSONResponse(HabitHistoryResponse.model_construct(data=history, next_cursor=next_cursor))
 
 
 @router.put("/{habit_id}", response_model=HabitResponse)
 async def update_habit(
     habit_id: int,
     habit_data: HabitUpdateSchema,
-    current_profile: Profile = Depends(get_current_active_profile),
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
     db: AsyncSession = Depends(get_db)
 ):
     """Обновление привычки"""
@@ -77,13 +138,13 @@ async def update_habit(
     updated_habit = await habit_service.update_one(habit_id, habit_data, current_profile.id)
     if not updated_habit:
         raise NotFoundException("Habit not found")
-    return HabitResponse(data=updated_habit)
+    return FastJSONResponse(HabitResponse.model_construct(data=updated_habit))
 
 
 @router.delete("/{habit_id}", response_model=HabitDeleteResponse)
 async def delete_habit(
     habit_id: int,
-    current_profile: Profile = Depends(get_current_active_profile),
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
     db: AsyncSession = Depends(get_db)
 ):
     """Удаление привычки"""
@@ -91,64 +152,78 @@ async def delete_habit(
     deleted = await habit_service.delete_one(habit_id, current_profile.id)
     if not deleted:
         raise NotFoundException("Habit not found")
-    return HabitDeleteResponse(deleted_habit_id=habit_id)
+    return FastJSONResponse(HabitDeleteResponse.model_construct(deleted_habit_id=habit_id))
 
 
-@router.get("/date/{target_date}", response_model=HabitListResponse)
+@router.get("/date/{target_date}", response_model=HabitListResponse, dependencies=etag_dependencies)
 async def get_habits_for_date(
     target_date: date,
-    current_profile: Profile = Depends(get_current_active_profile),
-    db: AsyncSession = Depends(get_db)
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
+    data_version: str = Depends(habit_data_version)
 ):
     """Получение привычек для конкретной даты (главный экран)"""
-    habit_service = HabitService(db)
+    habit_service = HabitService(db, data_version)
     habits = await habit_service.get_habits_for_date(current_profile.id, target_date)
-    return HabitListResponse(data=habits)
+    return FastJSONResponse(HabitListResponse.model_construct(data=habits))
 
 
 @router.put("/{habit_id}/instance", response_model=HabitResponse)
 async def mark_habit_instance(
-        habit_id: int,
+    habit_id: int,
     payload: HabitInstanceCreateSchema,
-    current_profile: Profile = Depends(get_current_active_profile),
-        db: AsyncSession = Depends(get_db)
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_db)
 ):
     """Отметка статуса привычки (выполнено/пропущено)"""
     try:
         habit_service = HabitService(db)
-        await habit_service.mark_habit_instance(
+        habit = await habit_service.mark_habit_instance(
             habit_id=habit_id,
             instance_date=payload.instance_date,
             status=payload.status,
             reason=payload.reason,
             profile_id=current_profile.id
         )
-        habit = await habit_service.get_one(habit_id, current_profile.id)
-        return HabitResponse(data=habit)
+        return FastJSONResponse(HabitResponse.model_construct(data=habit))
     except NotFoundException:
         raise HTTPException(status_code=404, detail="Habit not found")
 
 
-@router.get("/stats/day/{target_date}", response_model=DayStatsResponse)
+@router.put("/instances/batch", response_model=HabitInstanceBatchResponse)
+async def mark_habit_instances(
+    payload: HabitInstanceBatchSchema,
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пакетная отметка статусов нескольких привычек"""
+    habit_service = HabitService(db)
+    results = await habit_service.mark_habit_instances(payload.items, current_profile.id)
+    return FastJSONResponse(HabitInstanceBatchResponse.model_construct(data=results))
+
+
+@router.get("/stats/day/{target_date}", response_model=DayStatsResponse, dependencies=etag_dependencies)
 async def get_day_stats(
     target_date: date,
-    current_profile: Profile = Depends(get_current_active_profile),
-    db: AsyncSession = Depends(get_db)
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
+    data_version: str = Depends(habit_data_version)
 ):
     """Получение статистики для конкретного дня"""
-    habit_service = HabitService(db)
+    habit_service = HabitService(db, data_version)
     stats = await habit_service.get_day_stats(current_profile.id, target_date)
-    return DayStatsResponse(data=stats)
+    return FastJSONResponse(DayStatsResponse.model_construct(data=stats))
 
 
-@router.get("/stats/calendar", response_model=DayStatsListResponse)
+@router.get("/stats/calendar", response_model=DayStatsListResponse, dependencies=etag_dependencies)
 async def get_calendar_stats(
     start_date: date = Query(..., description="Начальная дата периода"),
     end_date: date = Query(..., description="Конечная дата периода"),
-    current_profile: Profile = Depends(get_current_active_profile),
-    db: AsyncSession = Depends(get_db)
+    current_profile: AuthPrincipal = Depends(get_current_active_profile),
+    db: AsyncSession = Depends(get_read_db),
+    data_version: str = Depends(habit_data_version)
 ):
     """Получение статистики календаря за период"""
-    habit_service = HabitService(db)
+    habit_service = HabitService(db, data_version)
     stats = await habit_service.get_calendar_stats(current_profile.id, start_date, end_date)
-    return DayStatsListResponse(data=stats)
+    return FastJSONResponse(DayStatsListResponse.model_construct(data=stats))
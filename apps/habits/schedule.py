@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+ALL_DAYS_MASK = 0b1111111
+
+
+def days_to_mask(days_of_week: Iterable[str]) -> int:
+    """["0", "2", "4"] -> 0b0010101 (бит N = день недели N, 0=Понедельник)"""
+    mask = 0
+    for day in days_of_week:
+        mask |= 1 << int(day)
+    return mask
+
+
+def mask_to_days(days_mask: int) -> List[str]:
+    """0b0010101 -> ["0", "2", "4"]"""
+    return [str(day) for day in range(7) if days_mask >> day & 1]
+
+
+@lru_cache(maxsize=7)
+def masks_with_weekday(weekday: int) -> Tuple[int, ...]:
+    """Все маски, в которых установлен бит weekday (для индексируемого IN-условия)"""
+    return tuple(mask for mask in range(ALL_DAYS_MASK + 1) if mask >> weekday & 1)
+
+
+def scheduled_dates(start_date: date, end_date: date, days_mask: int) -> List[date]:
+    """Все даты периода, попадающие на дни недели привычки"""
+    days = (start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1))
+    return [day for day in days if days_mask >> day.weekday() & 1]
+
+
+def last_scheduled_date(start_date: date, end_date: Optional[date], days_mask: int) -> Optional[date]:
+    """Последняя запланированная дата привычки (None для бессрочной или пустой)"""
+    if end_date is None:
+        return None
+    dates = scheduled_dates(max(start_date, end_date - timedelta(days=6)), end_date, days_mask)
+    return dates[-1] if dates else None
+
+
+def is_scheduled(day: date, start_date: date, end_date: Optional[date], days_mask: int) -> bool:
+    """Попадает ли день в расписание привычки"""
+    return start_date <= day and (end_date is None or day <= end_date) and bool(days_mask >> day.weekday() & 1)
+
+
+def next_scheduled_date(after: date, end_date: Optional[date], days_mask: int) -> Optional[date]:
+    """Первая запланированная дата строго после after (None, если расписание закончилось)"""
+    for offset in range(1, 8):
+        day = after + timedelta(days=offset)
+        if end_date is not None and day > end_date:
+            return None
+        if days_mask >> day.weekday() & 1:
+            return day
+    return None
@@ -17,6 +17,11 @@ class HabitInstanceResponse(SuccessResponse):
     message: str = "success"
 
 
+class HabitInstanceBatchResponse(SuccessResponse):
+    data: List[HabitInstanceBatchResultSchema]
+    message: str = "success"
+
+
 class HabitListResponse(SuccessResponse):
     data: List[HabitSchema]
     message: str = "success"
@@ -39,6 +44,7 @@ class DayStatsListResponse(SuccessResponse):
 
 class HabitHistoryResponse(SuccessResponse):
     data: List[HabitHistorySchema]
+    next_cursor: Optional[str] = None
     message: str = "success"
 
 class HabitDeleteResponse(SuccessResponse):
@@ -1,7 +1,9 @@
 from enum import Enum
 from datetime import date, datetime
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Annotated, Optional, List
+
+WeekDay = Annotated[str, Field(pattern=r"^[0-6]$")]
 
 
 class HabitStatus(str, Enum):
@@ -15,7 +17,7 @@ class HabitCreateSchema(BaseModel):
     name: str = Field(..., min_length=1, max_length=255, description="Название привычки")
     description: Optional[str] = Field(None, max_length=1000, description="Описание привычки")
     duration_days: int = Field(..., gt=0, le=365, description="Длительность привычки в днях")
-    days_of_week: List[str] = Field(..., description="Дни недели (0-6, где 0=Понедельник)")
+    days_of_week: List[WeekDay] = Field(..., description="Дни недели (0-6, где 0=Понедельник)")
     start_date: date = Field(..., description="Дата начала привычки")
 
     class Config:
@@ -26,7 +28,7 @@ class HabitUpdateSchema(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = Field(None, max_length=1000)
     duration_days: Optional[int] = Field(None, gt=0, le=365)
-    days_of_week: Optional[List[str]] = None
+    days_of_week: Optional[List[WeekDay]] = None
     is_active: Optional[bool] = None
 
     class Config:
@@ -41,6 +43,9 @@ class HabitSchema(HabitCreateSchema):
     created_at: datetime
     updated_at: datetime
     habit_status: Optional[str] = None
+    current_streak: int = 0
+    longest_streak: int = 0
+    last_done_date: Optional[date] = None
 
     class Config:
         from_attributes = True
@@ -55,6 +60,22 @@ class HabitInstanceCreateSchema(BaseModel):
         from_attributes = True
 
 
+class HabitInstanceBatchItemSchema(HabitInstanceCreateSchema):
+    habit_id: int = Field(..., description="ID привычки")
+
+
+class HabitInstanceBatchSchema(BaseModel):
+    items: List[HabitInstanceBatchItemSchema] = Field(..., min_length=1, max_length=500)
+
+
+class HabitInstanceBatchResultSchema(BaseModel):
+    habit_id: int
+    instance_date: date
+    status: HabitStatus
+    success: bool
+    error: Optional[str] = None
+
+
 class HabitInstanceSchema(BaseModel):
     id: int
     habit_id: int
@@ -1,276 +1,553 @@
+import base64
+import binascii
 from datetime import date, datetime, timedelta
 
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, and_, func
+from sqlalchemy import Date, DateTime, Text, delete, func, insert, and_, cast, literal, true, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from apps.habits.schemas.schemas import (
     HabitSchema, 
     HabitCreateSchema, 
     HabitUpdateSchema,
     HabitInstanceCreateSchema,
+    HabitInstanceBatchItemSchema,
+    HabitInstanceBatchResultSchema,
     HabitInstanceSchema,
     DayStatsSchema,
-    HabitHistorySchema
+    HabitHistorySchema,
+    HabitStatus as HabitStatusSchema,
 )
-from apps.habits.models import Habit, HabitInstance, HabitStatus
-from typing import List, Optional
-from apps.core.exceptions import NotFoundException
+from apps.database.repository import BaseRepository
+from apps.habits.models import Habit, HabitInstance, HabitStatus, ProfileDataVersion
+from apps.habits.schedule import days_to_mask, last_scheduled_date, scheduled_dates
+from apps.habits.rollups import DailyStatsRollup
+from apps.habits.streaks import HabitStreaks, current_streak, extend_streak_statement
+from apps.habits.versions import archive_horizon, bump_version_statement, version_statement
+from typing import List, Optional, Tuple
+from apps.core.cache import ProfileVersionedCache
+from apps.core.config import settings
+from apps.core.exceptions import BadRequestException, NotFoundException
 from fastapi import HTTPException
+
+
+habit_cache = ProfileVersionedCache(
+    maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
+
+HISTORY_PAGE_SIZE = 50
+# Поля HabitSchema, читаемые напрямую из Habit
+HABIT_SCHEMA_FIELDS = tuple(field for field in HabitSchema.model_fields if field != "habit_status")
+
+
+def encode_history_cursor(instance_date: date, instance_id: int) -> str:
+    """Непрозрачный курсор истории: позиция (date, id) последней строки страницы"""
+    return base64.urlsafe_b64encode(f"{instance_date.isoformat()}:{instance_id}".encode()).decode()
+
+
+def decode_history_cursor(cursor: str) -> Tuple[date, int]:
+    try:
+        instance_date, instance_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return date.fromisoformat(instance_date), int(instance_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise BadRequestException("Invalid cursor")
+
+
 class HabitService:
-    def __init__(self, db: AsyncSession):
-        self.db = db
+    def __init__(self, db: AsyncSession, cache_version: Optional[str] = None):
+        self.session = db
+        # Запросы к habits по id с RETURNING; сигнатуры сервиса отличаются от репозитория
+        self.repository = BaseRepository(Habit, db)
+        # Версия данных из data_version: общая для всех процессов, ключ habit_cache строится по ней.
+        # Дата входит в ключ, как и в ETag: текущая серия и виртуальные pending-дни зависят от дня
+        self.cache_version = f"{cache_version}|{date.today().isoformat()}" if cache_version else None
+        self.rollup = DailyStatsRollup(db)
+        self.streaks = HabitStreaks(db)
 
     async def add_one(self, data: HabitCreateSchema, profile_id: int) -> HabitSchema:
         """Создание новой привычки"""
-        habit = Habit(
-            name=data.name,
-            description=data.description,
-            duration_days=data.duration_days,
-            days_of_week=data.days_of_week,
-            start_date=data.start_date,
-            end_date=data.start_date + timedelta(days=data.duration_days - 1),
-            profile_id=profile_id
+        await self.rollup.acquire(profile_id)
+        habit = await self.repository.add_one(
+            {
+                "name": data.name,
+                "description": data.description,
+                "duration_days": data.duration_days,
+                "days_mask": days_to_mask(data.days_of_week),
+                "start_date": data.start_date,
+                "end_date": data.start_date + timedelta(days=data.duration_days - 1),
+                "profile_id": profile_id,
+            },
+            commit=False,
         )
-        self.db.add(habit)
-        await self.db.commit()
-        await self.db.refresh(habit)
-        
-        # Создаем экземпляры привычки для всех запланированных дней
-        await self._create_habit_instances(habit)
-        
-        return HabitSchema.from_orm(habit)
+
+        if settings.MATERIALIZE_PENDING_INSTANCES:
+            # Создаем экземпляры привычки для всех запланированных дней
+            await self._create_habit_instances(habit)
+        await self.rollup.refresh(profile_id, habit.start_date, habit.end_date)
+        await self.session.commit()
+        habit_cache.bump(profile_id)
+
+        return self._to_schema(habit, self._latest_status(habit, None, None))
 
     async def _create_habit_instances(self, habit: Habit) -> None:
-        """Создание экземпляров привычки для всех запланированных дней"""
-        current_date = habit.start_date
-        end_date = habit.end_date or (habit.start_date + timedelta(days=habit.duration_days - 1))
-        
-        while current_date <= end_date:
-            weekday = str(current_date.weekday())
-            if weekday in habit.days_of_week:
-                instance = HabitInstance(
-                    habit_id=habit.id,
-                    date=current_date,
-                    status=HabitStatus.pending
+        """Создание экземпляров привычки для всех запланированных дней одним bulk insert"""
+        rows = [
+            {"habit_id": habit.id, "date": instance_date, "status": HabitStatus.pending}
+            for instance_date in scheduled_dates(habit.start_date, habit.end_date, habit.days_mask)
+        ]
+        if rows:
+            await self.session.execute(insert(HabitInstance), rows)
+
+    @staticmethod
+    def _habits_with_latest_status():
+        """Привычки вместе со статусом последнего экземпляра (LATERAL join)"""
+        latest = (
+            select(HabitInstance.status, HabitInstance.date)
+            # Нижняя граница дат отсекает партиции до начала привычки (runtime pruning)
+            .where(HabitInstance.habit_id == Habit.id, HabitInstance.date >= Habit.start_date)
+            .order_by(HabitInstance.date.desc())
+            .limit(1)
+            .correlate(Habit)
+            .lateral("latest_instance")
+        )
+        return select(Habit, latest.c.status, latest.c.date).outerjoin(latest, true())
+
+    @staticmethod
+    def _habits_for_date(profile_id: int, target_date: date):
+        """Запланированные на дату привычки профиля со статусом экземпляра этого дня"""
+        return (
+            select(Habit, HabitInstance.status)
+            .outerjoin(
+                HabitInstance,
+                and_(
+                    HabitInstance.habit_id == Habit.id,
+                    HabitInstance.date == target_date
                 )
-                self.db.add(instance)
-            current_date += timedelta(days=1)
-        
-        await self.db.commit()
+            )
+            .where(Habit.profile_id == profile_id, Habit.scheduled_on(target_date))
+        )
 
+    @staticmethod
+    def _latest_status_returning():
+        """Статус и дата последнего экземпляра как скалярные подзапросы для RETURNING"""
+        latest = (
+            select(HabitInstance)
+            .where(HabitInstance.habit_id == Habit.id, HabitInstance.date >= Habit.start_date)
+            .order_by(HabitInstance.date.desc())
+            .limit(1)
+            .correlate(Habit)
+        )
+        return (
+            latest.with_only_columns(HabitInstance.status).scalar_subquery().label("latest_status"),
+            latest.with_only_columns(HabitInstance.date).scalar_subquery().label("latest_date"),
+        )
+
+    @staticmethod
+    def _latest_status(
+        habit: Habit, status: Optional[HabitStatus], status_date: Optional[date]
+    ) -> Optional[HabitStatus]:
+        """Статус последнего экземпляра с учетом виртуальных pending-дней расписания"""
+        last_date = last_scheduled_date(habit.start_date, habit.end_date, habit.days_mask)
+        if last_date and (status_date is None or status_date < last_date):
+            return HabitStatus.pending
+        return status
+
+    @staticmethod
+    def _to_schema(habit: Habit, status: Optional[HabitStatus]) -> HabitSchema:
+        """Схема из строки БД без валидации (значения уже типизированы ORM)"""
+        values = {field: getattr(habit, field) for field in HABIT_SCHEMA_FIELDS}
+        values["current_streak"] = current_streak(habit)
+        values["habit_status"] = status.value if status is not None else None
+        return HabitSchema.model_construct(**values)
+
+    @habit_cache.cached
     async def get_one(self, habit_id: int, profile_id: int) -> Optional[HabitSchema]:
         """Получение одной привычки"""
-        result = await self.db.execute(
-            select(Habit).where(
+        result = await self.session.execute(
+            self._habits_with_latest_status().where(
                 and_(Habit.id == habit_id, Habit.profile_id == profile_id)
             )
         )
-        habit = result.scalar_one_or_none()
-        if not habit:
+        row = result.one_or_none()
+        if not row:
             return None
-        
-        instance_result = await self.db.execute(
-            select(HabitInstance)
-            .where(HabitInstance.habit_id == habit_id)
-            .order_by(HabitInstance.date.desc())
-            .limit(1)
-        )
-        instance = instance_result.scalar_one_or_none()
-        
-        habit_dict = HabitSchema.from_orm(habit).dict()
-        if instance:
-            habit_dict['habit_status'] = instance.status.value
-        
-        return HabitSchema(**habit_dict)
+        habit, status, status_date = row
+        return self._to_schema(habit, self._latest_status(habit, status, status_date))
 
+    @habit_cache.cached
     async def find_all(self, profile_id: int, is_active: Optional[bool] = None) -> List[HabitSchema]:
         """Получение всех привычек профиля"""
-        query = select(Habit).where(Habit.profile_id == profile_id)
+        query = self._habits_with_latest_status().where(Habit.profile_id == profile_id)
         if is_active is not None:
             query = query.where(Habit.is_active == is_active)
-        
-        result = await self.db.execute(query)
-        habits = result.scalars().all()
-        
-        habits_with_status = []
-        for habit in habits:
-            instance_result = await self.db.execute(
-                select(HabitInstance)
-                .where(HabitInstance.habit_id == habit.id)
-                .order_by(HabitInstance.date.desc())
-                .limit(1)
-            )
-            instance = instance_result.scalar_one_or_none()
-            
-            habit_dict = HabitSchema.from_orm(habit).dict()
-            if instance:
-                habit_dict['habit_status'] = instance.status.value
-            
-            habits_with_status.append(HabitSchema(**habit_dict))
-        return habits_with_status
+
+        result = await self.session.execute(query)
+        return [
+            self._to_schema(habit, self._latest_status(habit, status, status_date))
+            for habit, status, status_date in result
+        ]
 
     async def update_one(self, habit_id: int, data: HabitUpdateSchema, profile_id: int) -> Optional[HabitSchema]:
-        """Обновление привычки"""
-        habit = await self.get_one(habit_id, profile_id)
-        if not habit:
-            return None
+        """Обновление привычки: UPDATE ... RETURNING без дополнительных чтений"""
         update_data = data.dict(exclude_unset=True)
-        if update_data:
-            stmt = (
-            update(Habit)
-                .where(and_(Habit.id == habit_id, Habit.profile_id == profile_id))
-                .values(**update_data)
-            .execution_options(synchronize_session="fetch")
+        if "days_of_week" in update_data:
+            update_data["days_mask"] = days_to_mask(update_data.pop("days_of_week") or [])
+        if "duration_days" in update_data:
+            update_data["end_date"] = Habit.start_date + (update_data["duration_days"] - 1)
+        if not update_data:
+            return await self.get_one(habit_id, profile_id)
+
+        await self.rollup.acquire(profile_id)
+        # UPDATE ... FROM habits AS old: RETURNING отдает и прежнее расписание
+        old = aliased(Habit)
+        row = await self.repository.update_one(
+            habit_id,
+            update_data,
+            filters={"profile_id": profile_id},
+            where=(old.id == Habit.id,),
+            returning=(Habit, old.days_mask, old.end_date, *self._latest_status_returning()),
+            commit=False,
+        )
+        if row is None:
+            await self.session.rollback()  # снимаем блокировку профиля
+            return None
+        habit, old_mask, old_end_date, status, status_date = row
+        if update_data.keys() & {"days_mask", "is_active", "duration_days"}:
+            if settings.MATERIALIZE_PENDING_INSTANCES:
+                await self._reconcile_habit_instances(habit, old_mask, old_end_date)
+            await self.streaks.recompute_habit(habit)
+            refresh_end = max(filter(None, (habit.end_date, old_end_date)), default=None)
+            await self.rollup.refresh(profile_id, habit.start_date, refresh_end)
+        await self.session.commit()
+        habit_cache.bump(profile_id)
+        return self._to_schema(habit, self._latest_status(habit, status, status_date))
+
+    async def _reconcile_habit_instances(self, habit: Habit, old_mask: int, old_end_date: Optional[date]) -> None:
+        """Приведение материализованных экземпляров к новому расписанию.
+
+        Удаляются только pending-строки дней, выпавших из расписания, и добавляются
+        только новые дни; строки с отметкой не трогаются. Один запрос (DELETE в CTE).
+        """
+        old_dates = set(scheduled_dates(habit.start_date, old_end_date, old_mask)) if old_end_date else set()
+        new_dates = set(scheduled_dates(habit.start_date, habit.end_date, habit.days_mask)) if habit.end_date else set()
+        removed, added = sorted(old_dates - new_dates), sorted(new_dates - old_dates)
+        if not removed and not added:
+            return
+
+        instances = HabitInstance.__table__
+        prune = delete(instances).where(
+            instances.c.habit_id == habit.id,
+            instances.c.status == HabitStatus.pending,
+            instances.c.date.in_(removed),
         )
-        await self.db.execute(stmt)
-        await self.db.commit()
-        return await self.get_one(habit_id, profile_id)
+        if not added:
+            await self.session.execute(prune)
+            return
+        now = datetime.utcnow()
+        stmt = pg_insert(instances).values([
+            {
+                "habit_id": habit.id,
+                "date": instance_date,
+                "status": HabitStatus.pending,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for instance_date in added
+        ]).on_conflict_do_nothing(index_elements=["habit_id", "date"])
+        if removed:
+            stmt = stmt.add_cte(prune.returning(instances.c.id).cte("pruned_instances"))
+        await self.session.execute(stmt)
 
     async def delete_one(self, habit_id: int, profile_id: int) -> bool:
         """Удаление привычки"""
-        stmt = delete(Habit).where(
-            and_(Habit.id == habit_id, Habit.profile_id == profile_id)
+        await self.rollup.acquire(profile_id)
+        deleted = await self.repository.delete_one(
+            habit_id,
+            filters={"profile_id": profile_id},
+            returning=(Habit.start_date, Habit.end_date),
+            commit=False,
         )
-        result = await self.db.execute(stmt)
-        await self.db.commit()
-        return result.rowcount > 0
+        if deleted:
+            await self.rollup.refresh(profile_id, deleted.start_date, deleted.end_date)
+        await self.session.commit()
+        habit_cache.bump(profile_id)
+        return deleted is not None
 
+    @habit_cache.cached
     async def get_habits_for_date(self, profile_id: int, target_date: date) -> List[HabitSchema]:
         """Получение привычек для конкретной даты"""
-        weekday = str(target_date.weekday())
-        stmt = select(Habit).where(
-            and_(
-                Habit.profile_id == profile_id,
-                Habit.is_active == True,
-                Habit.start_date <= target_date,
-                Habit.end_date >= target_date,
-                Habit.days_of_week.contains([weekday])
-            )
-        )
-        result = await self.db.execute(stmt)
-        habits = result.scalars().all()
-        habits_with_instances = []
-        for habit in habits:
-            instance_result = await self.db.execute(
-                select(HabitInstance).where(
-                    and_(
-                        HabitInstance.habit_id == habit.id,
-                        HabitInstance.date == target_date
-                    )
-                )
-            )
-            instance = instance_result.scalar_one_or_none()
-            habit_dict = HabitSchema.from_orm(habit).dict()
-            if instance:
-                habit_dict['habit_status'] = instance.status.value
-            else:
-                habit_dict['habit_status'] = HabitStatus.pending.value
-            habits_with_instances.append(HabitSchema(**habit_dict))
-        return habits_with_instances
+        result = await self.session.execute(self._habits_for_date(profile_id, target_date))
+        return [self._to_schema(habit, status or HabitStatus.pending) for habit, status in result]
 
     async def mark_habit_instance(
         self,
-            habit_id: int,
-            instance_date: date,
-            status: HabitStatus,
+        habit_id: int,
+        instance_date: date,
+        status: HabitStatus,
         reason: Optional[str] = None,
         profile_id: int = None
-    ) -> HabitInstance:
-        """Отметка статуса привычки на конкретную дату"""
-        if profile_id:
-            habit = await self.get_one(habit_id, profile_id)
-        if not habit:
-                raise NotFoundException("Habit not found")
-        instance_result = await self.db.execute(
-            select(HabitInstance).where(
-                and_(
-                    HabitInstance.habit_id == habit_id,
-                    HabitInstance.date == instance_date
-                )
+    ) -> HabitSchema:
+        """Отметка статуса привычки на конкретную дату.
+
+        Проверка владения, запись отметки, продление серии и чтение данных для ответа -
+        один запрос (data-modifying CTE); вторым запросом пересчитывается дневная статистика.
+        """
+        status = HabitStatus(status)
+        keep_row = status != HabitStatus.pending or settings.MATERIALIZE_PENDING_INSTANCES
+        # Блокировка профиля берется первой, в том же запросе, см. DailyStatsRollup.lock;
+        # версия данных профиля растет в CTE bumped_version ниже.
+        # FOR KEY SHARE перечитывает строку после блокировки: привычка, удаленная
+        # параллельной транзакцией, не попадет в CTE, и отметка вернет 404
+        owned = (
+            select(
+                Habit,
+                DailyStatsRollup.lock(profile_id).label("rollup_lock"),
+                # День в архивных партициях: отметка отклоняется, записи ниже не выполняются
+                func.coalesce(archive_horizon(profile_id) > instance_date, False).label("archived"),
             )
+            .where(Habit.id == habit_id, Habit.profile_id == profile_id)
+            .with_for_update(read=True, key_share=True)
+            .cte("owned_habit")
         )
-        instance = instance_result.scalar_one_or_none()
-        if instance:
-            instance.status = status
-            instance.reason = reason
+        writable = ~owned.c.archived
+        instances = HabitInstance.__table__
+        if keep_row:
+            now = datetime.utcnow()
+            write = pg_insert(instances).from_select(
+                ["habit_id", "date", "status", "reason", "created_at", "updated_at"],
+                select(
+                    owned.c.id,
+                    literal(instance_date, Date),
+                    cast(literal(status.value), instances.c.status.type),
+                    literal(reason, Text),
+                    literal(now, DateTime),
+                    literal(now, DateTime),
+                ).where(writable),
+            )
+            write = write.on_conflict_do_update(
+                index_elements=["habit_id", "date"],
+                set_={
+                    "status": write.excluded.status,
+                    "reason": write.excluded.reason,
+                    "updated_at": write.excluded.updated_at,
+                },
+            )
         else:
-            instance = HabitInstance(
-                habit_id=habit_id,
-                date=instance_date,
-                status=status,
-                reason=reason
+            # pending вычисляется из расписания, хранить строку не нужно
+            write = delete(instances).where(
+                instances.c.habit_id.in_(select(owned.c.id).where(writable)),
+                instances.c.date == instance_date
             )
-            self.db.add(instance)
-        await self.db.commit()
-        await self.db.refresh(instance)
-        return instance
+        written = write.returning(instances.c.id).cte("written_instance")
 
-    from sqlalchemy import select
-
-    async def get_day_stats(self, profile_id: int, target_date: date) -> DayStatsSchema:
-        q = select(Habit).where(
-            Habit.profile_id == profile_id,
-            Habit.is_active == True,
-            Habit.start_date <= target_date,
-            (Habit.end_date == None) | (Habit.end_date >= target_date)
+        habit_row = aliased(Habit, owned)
+        # Последняя отметка на другую дату (снимок до записи), текущая отметка учитывается ниже
+        latest = (
+            select(HabitInstance.status, HabitInstance.date)
+            .where(
+                HabitInstance.habit_id == habit_row.id,
+                HabitInstance.date >= habit_row.start_date,
+                HabitInstance.date != instance_date,
+            )
+            .order_by(HabitInstance.date.desc())
+            .limit(1)
+            .lateral("latest_instance")
+        )
+        versioned = (
+            bump_version_statement(profile_id, owned).returning(ProfileDataVersion.version).cte("bumped_version")
+        )
+        stmt = (
+            select(habit_row, owned.c.archived, latest.c.status, latest.c.date)
+            .add_cte(written, versioned)
+            .outerjoin(latest, true())
         )
-        result = await self.db.execute(q)
-        habits = result.scalars().all()
+        if status == HabitStatus.done:
+            extended = extend_streak_statement(owned.c.id, instance_date).where(writable).cte("extended_streak")
+            stmt = stmt.add_columns(*extended.c).outerjoin(extended, true())
+        result = await self.session.execute(stmt.execution_options(populate_existing=True))
+        row = result.one_or_none()
+        if not row:
+            raise NotFoundException("Habit not found")
+        habit, archived, latest_status, latest_date, *streak_values = row
+        if archived:
+            await self.session.rollback()
+            raise BadRequestException("Instance date is archived")
+        if keep_row and (latest_date is None or instance_date > latest_date):
+            latest_status, latest_date = status, instance_date
 
-        completed_habits = 0
-        skipped_habits = 0
-        pending_habits = 0
+        extended_values = streak_values if streak_values and streak_values[-1] is not None else None
+        await self.streaks.apply_mark(habit, instance_date, status, extended_values)
+        await self.rollup.refresh(profile_id, instance_date, instance_date)
+        await self.session.commit()
+        habit_cache.bump(profile_id)
+        return self._to_schema(habit, self._latest_status(habit, latest_status, latest_date))
 
-        for habit in habits:
-            q2 = select(HabitInstance).where(
-                HabitInstance.habit_id == habit.id,
-                HabitInstance.date == target_date
+    async def mark_habit_instances(
+        self, items: List[HabitInstanceBatchItemSchema], profile_id: int
+    ) -> List[HabitInstanceBatchResultSchema]:
+        """Пакетная отметка статусов: одна проверка владения и один upsert"""
+        # Для повторяющейся пары (habit_id, date) применяется последняя отметка
+        marks = {(item.habit_id, item.instance_date): item for item in items}
+        await self.rollup.acquire(profile_id)
+        owned_result = await self.session.execute(
+            select(Habit.id, archive_horizon(profile_id)).where(
+                Habit.profile_id == profile_id,
+                Habit.id.in_({habit_id for habit_id, _ in marks})
             )
-            res2 = await self.db.execute(q2)
-            instance = res2.scalar_one_or_none()
-            status = instance.status if instance else HabitStatus.pending
-            if isinstance(status, str):
-                try:
-                    status = HabitStatus(status)
-                except ValueError:
-                    status = HabitStatus.pending
-
-            if status == HabitStatus.done:
-                completed_habits += 1
-            elif status == HabitStatus.skipped:
-                skipped_habits += 1
-            else:
-                pending_habits += 1
+        )
+        owned_rows = owned_result.all()
+        owned = {habit_id for habit_id, _ in owned_rows}
+        horizon = owned_rows[0][1] if owned_rows else None
+        errors = {
+            key: "Habit not found" if key[0] not in owned else "Instance date is archived"
+            for key in marks
+            if key[0] not in owned or (horizon is not None and key[1] < horizon)
+        }
 
-        total_habits = len(habits)
-        completion_percentage = (completed_habits / total_habits * 100) if total_habits > 0 else 0
+        now = datetime.utcnow()
+        upserts, pending_keys = [], []
+        for (habit_id, instance_date), item in marks.items():
+            if (habit_id, instance_date) in errors:
+                continue
+            status = HabitStatus(item.status)
+            if status == HabitStatus.pending and not settings.MATERIALIZE_PENDING_INSTANCES:
+                pending_keys.append((habit_id, instance_date))
+            else:
+                upserts.append({
+                    "habit_id": habit_id,
+                    "date": instance_date,
+                    "status": status,
+                    "reason": item.reason,
+                    "created_at": now,
+                    "updated_at": now,
+                })
 
-        if completion_percentage == 0:
-            color_intensity = "none"
-        elif completion_percentage <= 33:
-            color_intensity = "light"
-        elif completion_percentage <= 66:
-            color_intensity = "medium"
+        if upserts:
+            stmt = pg_insert(HabitInstance).values(upserts)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["habit_id", "date"],
+                set_={
+                    "status": stmt.excluded.status,
+                    "reason": stmt.excluded.reason,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            await self.session.execute(stmt)
+        if pending_keys:
+            await self.session.execute(
+                delete(HabitInstance).where(tuple_(HabitInstance.habit_id, HabitInstance.date).in_(pending_keys))
+            )
+        changed = [key for key in marks if key not in errors]
+        changed_dates = sorted({instance_date for _, instance_date in changed})
+        if changed_dates:
+            await self.streaks.recompute(habit_ids={habit_id for habit_id, _ in changed})
+            # Только измененные дни: даты пакета могут отстоять друг от друга на годы
+            await self.rollup.refresh(profile_id, changed_dates[0], changed_dates[-1], dates=changed_dates)
+            await self.session.commit()
+            habit_cache.bump(profile_id)
         else:
-            color_intensity = "dark"
-
-        return DayStatsSchema(
-            date=target_date,
-            total_habits=total_habits,
-            completed_habits=completed_habits,
-            skipped_habits=skipped_habits,
-            pending_habits=pending_habits,
-            completion_percentage=completion_percentage,
-            color_intensity=color_intensity
+            # Записей не было: только снимаем блокировку профиля
+            await self.session.rollback()
+
+        return [
+            HabitInstanceBatchResultSchema.model_construct(
+                habit_id=item.habit_id,
+                instance_date=item.instance_date,
+                status=item.status,
+                success=(item.habit_id, item.instance_date) not in errors,
+                error=errors.get((item.habit_id, item.instance_date)),
+            )
+            for item in items
+        ]
+
+    @habit_cache.cached
+    async def get_history(
+        self,
+        profile_id: int,
+        habit_id: Optional[int] = None,
+        status: Optional[HabitStatus] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        cursor: Optional[str] = None,
+        limit: int = HISTORY_PAGE_SIZE,
+    ) -> Tuple[List[HabitHistorySchema], Optional[str]]:
+        """История отметок с keyset-пагинацией по (date, id) от новых к старым.
+
+        Для каждой привычки профиля LATERAL берет не больше limit + 1 строк после
+        курсора по индексу (habit_id, date DESC, id DESC), поэтому стоимость страницы
+        не зависит от глубины истории. Граница date >= start_date привычки отсекает
+        партиции до ее начала; отметки раньше start_date не входят ни в серии, ни в
+        статистику и в истории не показываются. Возвращает страницу и курсор следующей.
+        """
+        page = (
+            select(HabitInstance.id, HabitInstance.date, HabitInstance.status, HabitInstance.reason)
+            .where(HabitInstance.habit_id == Habit.id, HabitInstance.date >= Habit.start_date)
+            .order_by(HabitInstance.date.desc(), HabitInstance.id.desc())
+            .limit(limit + 1)
+        )
+        if status is not None:
+            page = page.where(HabitInstance.status == status)
+        if start_date is not None:
+            page = page.where(HabitInstance.date >= start_date)
+        if end_date is not None:
+            page = page.where(HabitInstance.date <= end_date)
+        if cursor is not None:
+            cursor_date, cursor_id = decode_history_cursor(cursor)
+            page = page.where(tuple_(HabitInstance.date, HabitInstance.id) < (cursor_date, cursor_id))
+        page = page.correlate(Habit).lateral("history_page")
+
+        stmt = (
+            select(Habit.id, Habit.name, page.c.id, page.c.date, page.c.status, page.c.reason)
+            .outerjoin(page, true())
+            .where(Habit.profile_id == profile_id)
+            .order_by(page.c.date.desc().nulls_last(), page.c.id.desc().nulls_last())
+            .limit(limit + 1)
         )
+        if habit_id is not None:
+            stmt = stmt.where(Habit.id == habit_id)
+        result = await self.session.execute(stmt)
+        rows = result.all()
+        if habit_id is not None and not rows:
+            raise NotFoundException("Habit not found")
+
+        rows = [row for row in rows if row[2] is not None]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_history_cursor(rows[-1][3], rows[-1][2])
+        return [
+            HabitHistorySchema.model_construct(
+                habit_id=row_habit_id,
+                habit_name=name,
+                instance_date=instance_date,
+                status=HabitStatusSchema(instance_status.value),
+                reason=reason,
+            )
+            for row_habit_id, name, _, instance_date, instance_status, reason in rows
+        ], next_cursor
+
+    async def data_version(self, profile_id: int) -> str:
+        """Версия данных профиля для ETag.
+
+        Счетчик profile_data_versions увеличивает каждая транзакция записи (см. versions.py).
+        profile_id входит в версию: у разных профилей счетчики совпадают.
+        """
+        version = (await self.session.execute(version_statement(profile_id))).scalar_one_or_none()
+        return f"{profile_id}:{version or 0}"
+
+    @habit_cache.cached
+    async def get_day_stats(self, profile_id: int, target_date: date) -> DayStatsSchema:
+        """Получение статистики для конкретного дня"""
+        stats = await self.get_calendar_stats(profile_id, target_date, target_date)
+        return stats[0]
 
+    @habit_cache.cached
     async def get_calendar_stats(self, profile_id: int, start_date: date, end_date: date) -> List[DayStatsSchema]:
-        """Получение статистики календаря за период"""
-        stats = []
-        current_date = start_date
-        while current_date <= end_date:
-            day_stat = await self.get_day_stats(profile_id, current_date)
-            stats.append(day_stat)
-            current_date += timedelta(days=1)
-        return stats
+        """Получение статистики календаря за период (чтение из profile_daily_stats)"""
+        if start_date > end_date:
+            return []
+        return await self.rollup.read(profile_id, start_date, end_date)
@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+from typing import Optional, Sequence
+
+from sqlalchemy import Date, DateTime, Select, and_, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from apps.habits.models import Habit, HabitInstance, HabitStatus
+from apps.habits.schemas.schemas import DayStatsSchema
+
+
+def calendar_days(start_date: date, end_date: date):
+    """Подзапрос с рядом дат [start_date, end_date] (generate_series)"""
+    day = cast(
+        func.generate_series(
+            cast(literal(start_date, Date), DateTime),
+            cast(literal(end_date, Date), DateTime),
+            timedelta(days=1),
+        ),
+        Date,
+    )
+    return select(day.label("day")).subquery("days")
+
+
+def listed_days(dates: Sequence[date]):
+    """Подзапрос с перечисленными датами (unnest массива)"""
+    return select(func.unnest(literal(sorted(set(dates)), ARRAY(Date))).label("day")).subquery("days")
+
+
+def calendar_stats_statement(
+    profile_id: int, start_date: date, end_date: date, dates: Optional[Sequence[date]] = None
+) -> Select:
+    """Агрегированная статистика по каждому дню периода одним запросом.
+
+    total_habits - активные привычки, в диапазон которых входит день, независимо от
+    дней недели расписания (как и до материализованной статистики).
+    dates - только перечисленные дни периода вместо всех дней подряд.
+    """
+    days = calendar_days(start_date, end_date) if dates is None else listed_days(dates)
+    return (
+        select(
+            days.c.day,
+            func.count(Habit.id).label("total_habits"),
+            func.count(HabitInstance.id)
+            .filter(HabitInstance.status == HabitStatus.done)
+            .label("completed_habits"),
+            func.count(HabitInstance.id)
+            .filter(HabitInstance.status == HabitStatus.skipped)
+            .label("skipped_habits"),
+        )
+        .select_from(days)
+        .outerjoin(
+            Habit,
+            and_(Habit.profile_id == profile_id, Habit.active_on(days.c.day)),
+        )
+        .outerjoin(
+            HabitInstance,
+            and_(
+                HabitInstance.habit_id == Habit.id,
+                HabitInstance.date == days.c.day,
+                # Явные границы периода дают отсечение партиций habitinstances
+                HabitInstance.date.between(start_date, end_date),
+            ),
+        )
+        .group_by(days.c.day)
+        .order_by(days.c.day)
+    )
+
+
+def color_intensity(completion_percentage: float) -> str:
+    if completion_percentage == 0:
+        return "none"
+    if completion_percentage <= 33:
+        return "light"
+    if completion_percentage <= 66:
+        return "medium"
+    return "dark"
+
+
+def build_day_stats(target_date: date, total_habits: int, completed_habits: int, skipped_habits: int) -> DayStatsSchema:
+    """Сборка DayStatsSchema из агрегированных счётчиков"""
+    completion_percentage = (completed_habits / total_habits * 100) if total_habits > 0 else 0
+    return DayStatsSchema(
+        date=target_date,
+        total_habits=total_habits,
+        completed_habits=completed_habits,
+        skipped_habits=skipped_habits,
+        pending_habits=total_habits - completed_habits - skipped_habits,
+        completion_percentage=completion_percentage,
+        color_intensity=color_intensity(completion_percentage),
+    )
@@ -0,0 +1,311 @@
+"""Серии выполнения привычек (streaks).
+
+Серия - подряд идущие запланированные дни (days_mask в пределах start_date..end_date)
+с отметкой done; незапланированные дни серию не прерывают и в нее не входят.
+current_streak/longest_streak/last_done_date хранятся в habits и обновляются
+в запросе отметки (extend_streak_statement); полный пересчет (gaps-and-islands)
+нужен при правке прошлых дней и смене расписания, а также для заполнения:
+
+    python -m apps.habits.streaks rebuild [--profile-id ID]
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import ColumnElement, Date, DateTime, Integer, and_, case, cast, func, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from apps.habits.models import Habit, HabitInstance, HabitStatus
+from apps.habits.rollups import DailyStatsRollup
+from apps.habits.schedule import next_scheduled_date
+
+STREAK_FIELDS = ("current_streak", "longest_streak", "last_done_date")
+
+
+def _streak_values(source, conditions: list, until: Optional[date] = None):
+    """Подзапрос (id, current_streak, longest_streak, last_done_date) по дням до until (не включая).
+
+    Отметки до archived_before лежат в архивных партициях: вместо них считается
+    затравка - день archived_last_done_date с весом archived_current_streak.
+    """
+    last_day = func.coalesce(source.c.end_date, func.current_date())
+    if until is not None:
+        last_day = func.least(last_day, literal(until - timedelta(days=1), Date))
+    calendar = select(
+        source.c.id.label("habit_id"),
+        source.c.days_mask,
+        source.c.archived_before,
+        source.c.archived_last_done_date.label("seed_day"),
+        source.c.archived_current_streak.label("seed_length"),
+        cast(
+            func.generate_series(
+                cast(
+                    func.coalesce(
+                        source.c.archived_last_done_date, func.greatest(source.c.start_date, source.c.archived_before)
+                    ),
+                    DateTime,
+                ),
+                cast(last_day, DateTime),
+                timedelta(days=1),
+            ),
+            Date,
+        ).label("day"),
+    ).where(*conditions).subquery("calendar")
+    weekday = cast(func.extract("isodow", calendar.c.day), Integer) - 1
+    # Порядковый номер дня среди запланированных дней привычки (день затравки входит всегда)
+    scheduled = (
+        select(
+            calendar.c.habit_id,
+            calendar.c.day,
+            calendar.c.archived_before,
+            calendar.c.seed_day,
+            calendar.c.seed_length,
+            func.row_number().over(partition_by=calendar.c.habit_id, order_by=calendar.c.day).label("ordinal"),
+        )
+        .where(
+            or_(
+                calendar.c.days_mask.bitwise_rshift(weekday).bitwise_and(1) == 1,
+                calendar.c.day == calendar.c.seed_day,
+            )
+        )
+        .subquery("scheduled")
+    )
+    # Для подряд идущих выполненных дней разность номеров постоянна - это ключ серии
+    is_seed = scheduled.c.day == scheduled.c.seed_day
+    done = (
+        select(
+            scheduled.c.habit_id,
+            scheduled.c.day,
+            case((is_seed, scheduled.c.seed_length), else_=1).label("weight"),
+            (
+                scheduled.c.ordinal
+                - func.row_number().over(partition_by=scheduled.c.habit_id, order_by=scheduled.c.day)
+            ).label("island"),
+        )
+        .outerjoin(
+            HabitInstance,
+            and_(
+                HabitInstance.habit_id == scheduled.c.habit_id,
+                HabitInstance.date == scheduled.c.day,
+                HabitInstance.status == HabitStatus.done,
+                or_(scheduled.c.archived_before.is_(None), HabitInstance.date >= scheduled.c.archived_before),
+            ),
+        )
+        .where(or_(HabitInstance.id.is_not(None), is_seed))
+        .subquery("done_days")
+    )
+    islands = (
+        select(
+            done.c.habit_id,
+            func.sum(done.c.weight).label("length"),
+            func.max(done.c.day).label("last_day"),
+            func.row_number().over(
+                partition_by=done.c.habit_id, order_by=func.max(done.c.day).desc()
+            ).label("recency"),
+        )
+        .group_by(done.c.habit_id, done.c.island)
+        .subquery("islands")
+    )
+    streaks = (
+        select(
+            islands.c.habit_id,
+            func.max(islands.c.length).filter(islands.c.recency == 1).label("current_streak"),
+            func.max(islands.c.length).label("longest_streak"),
+            func.max(islands.c.last_day).label("last_done_date"),
+        )
+        .group_by(islands.c.habit_id)
+        .subquery("streaks")
+    )
+    # LEFT JOIN обнуляет серии привычек, у которых не осталось выполненных дней
+    return (
+        select(
+            source.c.id,
+            func.coalesce(streaks.c.current_streak, 0).label("current_streak"),
+            func.greatest(func.coalesce(streaks.c.longest_streak, 0), source.c.archived_longest_streak)
+            .label("longest_streak"),
+            streaks.c.last_done_date,
+        )
+        .outerjoin(streaks, streaks.c.habit_id == source.c.id)
+        .where(*conditions)
+        .subquery("streak_values")
+    )
+
+
+def _source_conditions(source, habit_ids: Optional[Iterable[int]], profile_id: Optional[int]) -> list:
+    conditions = []
+    if habit_ids is not None:
+        conditions.append(source.c.id.in_(list(habit_ids)))
+    if profile_id is not None:
+        conditions.append(source.c.profile_id == profile_id)
+    return conditions
+
+
+def streaks_statement(habit_ids: Optional[Iterable[int]] = None, profile_id: Optional[int] = None):
+    """UPDATE habits из пересчета серий по всей истории отметок выбранных привычек"""
+    source = Habit.__table__.alias("source")
+    values = _streak_values(source, _source_conditions(source, habit_ids, profile_id))
+    habits = Habit.__table__
+    return (
+        update(habits)
+        .where(habits.c.id == values.c.id)
+        .values(
+            current_streak=values.c.current_streak,
+            longest_streak=values.c.longest_streak,
+            last_done_date=values.c.last_done_date,
+        )
+        .returning(habits.c.id, *(habits.c[field] for field in STREAK_FIELDS))
+    )
+
+
+def freeze_streaks_statement(until: date, profile_id: Optional[int] = None):
+    """UPDATE habits: серии по дням до until сохраняются в archived_* перед архивацией партиций.
+
+    После этого пересчеты серий не читают отметки до until (archived_before).
+    """
+    source = Habit.__table__.alias("source")
+    conditions = _source_conditions(source, None, profile_id) + [
+        source.c.start_date < until,
+        or_(source.c.archived_before.is_(None), source.c.archived_before < until),
+    ]
+    values = _streak_values(source, conditions, until)
+    habits = Habit.__table__
+    return (
+        update(habits)
+        .where(habits.c.id == values.c.id)
+        .values(
+            archived_before=until,
+            archived_current_streak=values.c.current_streak,
+            archived_longest_streak=values.c.longest_streak,
+            archived_last_done_date=values.c.last_done_date,
+        )
+        .returning(habits.c.id)
+    )
+
+
+def previous_scheduled_day(days_mask: ColumnElement, day: date) -> ColumnElement:
+    """SQL-выражение: ближайший день до day с битом в days_mask (не дальше недели)"""
+    return case(
+        *(
+            (days_mask.bitwise_and(1 << previous.weekday()) != 0, literal(previous, Date))
+            for previous in (day - timedelta(days=offset) for offset in range(1, 8))
+        )
+    )
+
+
+def extend_streak_statement(habit_id: ColumnElement, instance_date: date):
+    """UPDATE habits для отметки done после last_done_date: продление или начало серии.
+
+    Строка меняется, только если день запланирован и позже last_done_date; иначе
+    RETURNING пуст, и серии при необходимости пересчитывает HabitStreaks.apply_mark.
+    habit_id - колонка CTE с привычкой отметки (UPDATE ... FROM).
+    """
+    habits = Habit.__table__
+    streak = case(
+        (
+            habits.c.last_done_date == previous_scheduled_day(habits.c.days_mask, instance_date),
+            habits.c.current_streak + 1,
+        ),
+        else_=1,
+    )
+    return (
+        update(habits)
+        .where(
+            habits.c.id == habit_id,
+            habits.c.days_mask.bitwise_and(1 << instance_date.weekday()) != 0,
+            habits.c.start_date <= instance_date,
+            or_(habits.c.end_date.is_(None), habits.c.end_date >= instance_date),
+            or_(habits.c.last_done_date.is_(None), habits.c.last_done_date < instance_date),
+        )
+        .values(
+            current_streak=streak,
+            longest_streak=func.greatest(habits.c.longest_streak, streak),
+            last_done_date=instance_date,
+        )
+        .returning(*(habits.c[field] for field in STREAK_FIELDS))
+    )
+
+
+def current_streak(habit: Habit, today: Optional[date] = None) -> int:
+    """Текущая серия на сегодня: серия сгорает, если следующий запланированный день прошел без отметки"""
+    if habit.last_done_date is None:
+        return 0
+    next_date = next_scheduled_date(habit.last_done_date, habit.end_date, habit.days_mask)
+    if next_date is not None and next_date < (today or date.today()):
+        return 0
+    return habit.current_streak
+
+
+class HabitStreaks:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def apply_mark(
+        self, habit: Habit, instance_date: date, status: HabitStatus, extended: Optional[Sequence] = None
+    ) -> None:
+        """Серии после отметки (в текущей транзакции, commit делает вызывающий).
+
+        extended - RETURNING extend_streak_statement из запроса отметки, habit - строка
+        до него. Пересчет всей истории нужен только при правке дней не позже last_done_date.
+        """
+        if extended is not None:
+            self._set_loaded(habit, dict(zip(STREAK_FIELDS, extended)))
+            return
+        last_done = habit.last_done_date
+        if last_done is None or instance_date > last_done:
+            return
+        if not (status == HabitStatus.done and instance_date == last_done):
+            await self.recompute_habit(habit)
+
+    async def recompute_habit(self, habit: Habit) -> None:
+        """Полный пересчет серий одной привычки с обновлением загруженного объекта"""
+        result = await self.db.execute(streaks_statement(habit_ids=[habit.id]))
+        row = result.one_or_none()
+        if row:
+            self._set_loaded(habit, {field: getattr(row, field) for field in STREAK_FIELDS})
+
+    async def recompute(self, habit_ids: Optional[Iterable[int]] = None, profile_id: Optional[int] = None) -> int:
+        """Полный пересчет серий набора привычек одним запросом, возвращает число привычек"""
+        result = await self.db.execute(streaks_statement(habit_ids, profile_id))
+        return len(result.all())
+
+    async def rebuild(self, profile_id: Optional[int] = None) -> int:
+        """Пересчет серий по профилям, транзакция на профиль; возвращает число привычек.
+
+        Как и любая запись, берет блокировку профиля и увеличивает версию его данных.
+        """
+        if profile_id is not None:
+            profile_ids = [profile_id]
+        else:
+            profile_ids = (await self.db.execute(select(Habit.profile_id).distinct())).scalars().all()
+        count = 0
+        for pid in sorted(profile_ids):
+            await DailyStatsRollup(self.db).acquire(pid)
+            count += await self.recompute(profile_id=pid)
+            await self.db.commit()
+        return count
+
+    @staticmethod
+    def _set_loaded(habit: Habit, values: dict) -> None:
+        # Значения уже записаны в БД: обновляем объект, не помечая его измененным
+        for field, value in values.items():
+            set_committed_value(habit, field, value)
+
+
+async def _main(profile_id: Optional[int]) -> None:
+    from apps import detect_models
+    from apps.database import async_session
+
+    detect_models()
+    async with async_session() as session:
+        count = await HabitStreaks(session).rebuild(profile_id)
+        print(f"Rebuilt streaks for {count} habit(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="habit streaks maintenance")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--profile-id", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(_main(args.profile_id))
@@ -0,0 +1,50 @@
+"""Версия данных привычек профиля (profile_data_versions).
+
+Версия входит в ETag и ключ habit_cache. Она растет на 1 в каждой транзакции записи
+данных профиля тем же запросом, что берет блокировку профиля (DailyStatsRollup.lock):
+счетчик монотонен и не зависит от часов серверов приложения. В той же строке
+хранится граница архива профиля (apps.habits.partitions archive).
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Date, FromClause, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+
+from apps.habits.models import ProfileDataVersion
+
+
+def bump_version_statement(
+    profile_id: int, source: Optional[FromClause] = None, archived_before: Optional[date] = None
+):
+    """INSERT ... ON CONFLICT DO UPDATE: версия профиля + 1.
+
+    source - CTE, из которого выбирается строка вставки: без его строк версия не меняется,
+    а выражения CTE (блокировка профиля) вычисляются до блокировки строки версии.
+    archived_before - новая граница архива профиля (только сдвигается вперед).
+    """
+    values = select(literal(profile_id), literal(1), literal(archived_before, Date))
+    if source is not None:
+        values = values.select_from(source)
+    stmt = insert(ProfileDataVersion).from_select(["profile_id", "version", "archived_before"], values)
+    return stmt.on_conflict_do_update(
+        index_elements=[ProfileDataVersion.profile_id],
+        set_={
+            "version": ProfileDataVersion.version + 1,
+            "archived_before": func.greatest(ProfileDataVersion.archived_before, stmt.excluded.archived_before),
+        },
+    )
+
+
+def version_statement(profile_id: int):
+    """Текущая версия профиля (строки нет - данных профиль еще не менял)"""
+    return select(ProfileDataVersion.version).where(ProfileDataVersion.profile_id == profile_id)
+
+
+def archive_horizon(profile_id: int):
+    """Скалярный подзапрос: граница архива профиля (NULL - архива нет)"""
+    return (
+        select(ProfileDataVersion.archived_before)
+        .where(ProfileDataVersion.profile_id == profile_id)
+        .scalar_subquery()
+    )
@@ -6,7 +6,11 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from apps.core.config import settings
 from apps.core.error_handlers import general_exception_handler, http_exception_handler, validation_exception_handler
+from apps.core.etag import NotModified, not_modified_handler
 from apps.core.setup_app import create_app
+from apps.auth.utils import principal_cache, token_cache
+from apps.database import pool_stats
+from apps.habits.service import habit_cache
 
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(name)s - %(message)s", level=logging.DEBUG
@@ -26,6 +30,20 @@ async def healthcheck():
     return JSONResponse(content={"status": "ok"}, status_code=200)
 
 
+@app.get("/healthcheck/stats", include_in_schema=False)
+async def healthcheck_stats():
+    return JSONResponse(
+        content={
+            "habit_cache": habit_cache.stats(),
+            "auth_principal_cache": principal_cache.stats(),
+            "jwt_cache": token_cache.stats(),
+            "db_pool": pool_stats(),
+        },
+        status_code=200,
+    )
+
+
 app.add_exception_handler(Exception, general_exception_handler)
 app.add_exception_handler(HTTPException, http_exception_handler)
-app.add_exception_handler(RequestValidationError, validation_exception_handler)
\ No newline at end of file
+app.add_exception_handler(RequestValidationError, validation_exception_handler)
+app.add_exception_handler(NotModified, not_modified_handler)
\ No newline at end of file
@@ -4,16 +4,16 @@ from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.core.exceptions import NotFoundException
-from apps.database import get_db
+from apps.database import get_db, get_read_db
 from apps.profile.schemas import ProfileCreateSchema, ProfileResponse, ProfileListResponse
 from apps.profile.service import ProfileService
-from apps.auth.utils import hash_password
+from apps.auth.utils import hash_password_async, invalidate_auth_principal
 
 router = APIRouter()
 
 
 @router.get("/profile-list", response_model=ProfileListResponse)
-async def get_profile_list(db: AsyncSession = Depends(get_db)):
+async def get_profile_list(db: AsyncSession = Depends(get_read_db)):
     auth_service: ProfileService = ProfileService(db)
     profile = await auth_service.find_all()
     if not profile:
@@ -22,7 +22,7 @@ async def get_profile_list(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/profile/{profile_id}", response_model=ProfileResponse)
-async def get_profile(profile_id: int, db: AsyncSession = Depends(get_db)):
+async def get_profile(profile_id: int, db: AsyncSession = Depends(get_read_db)):
     auth_service: ProfileService = ProfileService(db)
     profile = await auth_service.get_one(profile_id)
     if not profile:
@@ -37,7 +37,7 @@ async def create_profile(
     auth_service: ProfileService = ProfileService(db)
 
     profile_dict = profile_data.model_dump()
-    profile_dict["password"] = hash_password(profile_dict["password"])
+    profile_dict["password"] = await hash_password_async(profile_dict["password"])
     profile_dict["is_active"] = True
 
     new_profile = await auth_service.add_one(profile_dict)
@@ -52,9 +52,11 @@ async def update_profile(
 ):
     auth_service: ProfileService = ProfileService(db)
     data = profile_data.model_dump()
+    data["password"] = await hash_password_async(data["password"])
     updated_profile = await auth_service.update_one(profile_id, data)
     if not updated_profile:
         raise NotFoundException("Profile not found")
+    invalidate_auth_principal(profile_id)
     return ProfileResponse(data=updated_profile)
 
 
@@ -64,4 +66,5 @@ async def delete_profile(profile_id: int, db: AsyncSession = Depends(get_db)):
     deleted = await auth_service.delete_one(profile_id)
     if not deleted:
         raise NotFoundException("Profile not found")
+    invalidate_auth_principal(profile_id)
     return
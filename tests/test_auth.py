@@ -0,0 +1,146 @@
+"""Авторизация: кеш проверенных JWT в decode_jwt и вход при конкурентной нагрузке.
+
+Пароли проверяются в password_executor: шторм входов не блокирует event loop,
+а переполнение очереди отдает 503 вместо роста задержки.
+"""
+import asyncio
+import time
+import timeit
+from datetime import timedelta
+
+import bcrypt
+import httpx
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy import insert, select
+
+from apps.auth import utils
+from apps.auth.utils import ALGORITHM, decode_jwt, encode_jwt, principal_cache, token_cache
+from apps.core.config import settings
+from apps.main import app
+from apps.profile.models import Profile
+
+DECODES = 2_000
+REPEATS = 5
+LOGINS = 8
+PASSWORD = "correct horse battery staple"
+# Проверка bcrypt с BCRYPT_ROUNDS=12 занимает ~0.25 с: в event loop такая пауза была бы видна
+MAX_LOOP_LAG = 0.1
+
+
+def uncached_decode(token: str) -> dict:
+    """Проверка подписи и срока на каждый запрос, как до кеша"""
+    return jwt.decode(token, settings.AUTH_JWT.SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def test_cached_decode_matches_verified_payload():
+    token_cache.clear()
+    token = encode_jwt({"sub": "1"})
+
+    first, second = decode_jwt(token), decode_jwt(token)
+    # Вызывающий код может менять payload: кеш отдает копию
+    second["sub"] = "2"
+
+    assert first == uncached_decode(token)
+    assert decode_jwt(token) == first
+
+
+def test_expired_token_is_rejected_after_cache_hit():
+    token_cache.clear()
+    token = encode_jwt({"sub": "1"}, expire_timedelta=timedelta(seconds=1))
+    decode_jwt(token)
+    time.sleep(1.1)
+
+    with pytest.raises(HTTPException) as error:
+        decode_jwt(token)
+    assert error.value.status_code == 401
+
+
+def test_cached_decode_throughput():
+    """Микробенчмарк: DECODES проверок одного токена с кешем и без (лучшее из REPEATS)"""
+    token_cache.clear()
+    token = encode_jwt({"sub": "1"})
+    decode_jwt(token)
+    token_cache.hits = 0
+
+    uncached = min(timeit.repeat(lambda: uncached_decode(token), number=DECODES, repeat=REPEATS))
+    cached = min(timeit.repeat(lambda: decode_jwt(token), number=DECODES, repeat=REPEATS))
+
+    print(f"decode_jwt: {DECODES / uncached:.0f}/s uncached, {DECODES / cached:.0f}/s cached")
+    assert token_cache.hits == DECODES * REPEATS
+    # HMAC, base64 и разбор JSON против sha256 токена и поиска в словаре
+    assert cached * 3 < uncached
+
+
+async def seed_profiles(session, count: int, rounds: int) -> list:
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+    rows = [{"login": f"user{number}", "password": hashed, "is_active": True} for number in range(count)]
+    await session.execute(insert(Profile), rows)
+    await session.commit()
+    return [row["login"] for row in rows]
+
+
+async def login(client: httpx.AsyncClient, username: str) -> httpx.Response:
+    return await client.post("/api/v1/auth/login-form", data={"username": username, "password": PASSWORD})
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Наибольшее опоздание пробуждения корутины, пока не выставлен stop"""
+    lag = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(lag, time.perf_counter() - started - interval)
+    return lag
+
+
+def test_concurrent_logins(run_db):
+    async def scenario(session):
+        # Устаревший work factor: каждый вход еще и перехеширует пароль в пуле
+        logins = await seed_profiles(session, LOGINS, rounds=4)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            stop = asyncio.Event()
+            lag = asyncio.create_task(loop_lag(stop))
+            responses = await asyncio.gather(*(login(client, username) for username in logins))
+            stop.set()
+
+            tokens = [response.json()["access_token"] for response in responses]
+            # Конкурентные запросы с разными токенами: principal_cache не путает профили
+            me = await asyncio.gather(
+                *(client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"}) for token in tokens)
+            )
+        stored = (await session.execute(select(Profile.id, Profile.login, Profile.password))).all()
+        return responses, me, await lag, stored
+
+    responses, me, lag, stored = run_db(scenario)
+
+    assert [response.status_code for response in responses] == [200] * LOGINS
+    assert [response.status_code for response in me] == [200] * LOGINS
+    assert sorted(response.json()["login"] for response in me) == sorted(row.login for row in stored)
+    assert {row.id: principal_cache.get(row.id).id for row in stored} == {row.id: row.id for row in stored}
+    for row in stored:
+        assert not utils.password_needs_rehash(row.password)
+        assert utils.validate_password(PASSWORD, row.password)
+    assert utils._password_jobs == 0
+    assert lag < MAX_LOOP_LAG, lag
+
+
+def test_login_storm_beyond_queue_gets_503(run_db, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 0)
+
+    async def scenario(session):
+        logins = await seed_profiles(session, settings.PASSWORD_HASH_WORKERS + 4, rounds=settings.BCRYPT_ROUNDS)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(login(client, username) for username in logins))
+
+    responses = run_db(scenario)
+
+    statuses = [response.status_code for response in responses]
+    assert set(statuses) == {200, 503}, statuses
+    assert statuses.count(200) >= settings.PASSWORD_HASH_WORKERS
+    assert all(response.headers["retry-after"] == "1" for response in responses if response.status_code == 503)
+    assert utils._password_jobs == 0
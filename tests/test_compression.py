@@ -0,0 +1,109 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+from starlette.datastructures import Headers
+from starlette.responses import StreamingResponse
+from starlette.types import Message, Receive, Scope, Send
+
+from apps.core.compression import CompressionMiddleware, brotli
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip;q=0.5, identity", "gzip"),
+        ("*", "gzip"),
+        ("gzip;q=0, *", None),
+        ("*, gzip;q=0", None),
+        ("gzip;q=0", None),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_choose_encoding(accept_encoding, expected):
+    assert CompressionMiddleware._choose_encoding(accept_encoding) == expected
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_choose_encoding_prefers_brotli():
+    assert CompressionMiddleware._choose_encoding("gzip, br") == "br"
+    assert CompressionMiddleware._choose_encoding("br;q=0, gzip") == "gzip"
+
+
+CHUNKS = [json.dumps({"chunk": number, "data": "x" * 500}).encode() + b"\n" for number in range(5)]
+
+
+async def streaming_app(scope: Scope, receive: Receive, send: Send) -> None:
+    async def chunks():
+        for chunk in CHUNKS:
+            yield chunk
+
+    await StreamingResponse(chunks(), media_type="application/json")(scope, receive, send)
+
+
+def stream(accept_encoding: str) -> tuple:
+    """Потоковый ответ через CompressionMiddleware: заголовки и сообщения тела как есть"""
+    middleware = CompressionMiddleware(streaming_app, minimum_size=1024)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+    messages = []
+
+    async def receive() -> Message:
+        await asyncio.Event().wait()
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start, *bodies = messages
+    return Headers(raw=start["headers"]), bodies
+
+
+def decompressor(encoding: str):
+    if encoding == "br":
+        return brotli.Decompressor().process
+    return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+
+
+@pytest.mark.parametrize(
+    "encoding",
+    ["gzip", pytest.param("br", marks=pytest.mark.skipif(brotli is None, reason="brotli is not installed"))],
+)
+def test_streaming_response_is_compressed_per_chunk(encoding):
+    headers, bodies = stream(encoding)
+
+    assert headers["content-encoding"] == encoding
+    assert "content-length" not in headers
+    assert "Accept-Encoding" in headers["vary"]
+    assert [body.get("more_body", False) for body in bodies] == [True] * len(CHUNKS) + [False]
+    # Каждый фрагмент сбрасывается в поток: клиент распаковывает его, не дожидаясь конца ответа
+    decompress = decompressor(encoding)
+    assert [decompress(body["body"]) for body in bodies] == [*CHUNKS, b""]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("*", "gzip"),
+        ("gzip;q=0, *", None),
+        ("*, gzip;q=0", None),
+        ("br;q=0, *", "gzip"),
+        ("identity", None),
+    ],
+)
+def test_streaming_response_negotiation(accept_encoding, expected):
+    headers, bodies = stream(accept_encoding)
+
+    assert headers.get("content-encoding") == expected
+    body = b"".join(body["body"] for body in bodies)
+    assert (decompressor(expected)(body) if expected else body) == b"".join(CHUNKS)
@@ -0,0 +1,43 @@
+"""data_version растет в каждой транзакции записи профиля, включая пересборку серий и статистики."""
+from datetime import date
+
+from sqlalchemy import insert
+
+from apps.habits.models import HabitStatus
+from apps.habits.rollups import DailyStatsRollup
+from apps.habits.schemas.schemas import HabitCreateSchema, HabitInstanceBatchItemSchema, HabitUpdateSchema
+from apps.habits.service import HabitService
+from apps.habits.streaks import HabitStreaks
+from apps.profile.models import Profile
+
+
+def test_every_write_bumps_data_version(run_db):
+    today = date.today()
+
+    async def scenario(session):
+        await session.execute(insert(Profile), [{"id": 1}, {"id": 2}])
+        await session.commit()
+        service = HabitService(session)
+        versions = [await service.data_version(1)]
+
+        async def written(operation):
+            await operation
+            versions.append(await service.data_version(1))
+
+        data = HabitCreateSchema(name="habit", duration_days=7, days_of_week=["0", "3"], start_date=today)
+        habit = await service.add_one(data, profile_id=1)
+        versions.append(await service.data_version(1))
+        await written(service.mark_habit_instance(habit.id, today, HabitStatus.done, profile_id=1))
+        await written(service.mark_habit_instance(habit.id, today, HabitStatus.pending, profile_id=1))
+        batch = [HabitInstanceBatchItemSchema(habit_id=habit.id, instance_date=today, status="skipped")]
+        await written(service.mark_habit_instances(batch, profile_id=1))
+        await written(service.update_one(habit.id, HabitUpdateSchema(days_of_week=["1"]), profile_id=1))
+        await written(HabitStreaks(session).rebuild(profile_id=1))
+        await written(DailyStatsRollup(session).rebuild(profile_id=1))
+        await written(service.delete_one(habit.id, profile_id=1))
+        return versions, await service.data_version(2)
+
+    versions, other_profile = run_db(scenario)
+
+    assert versions == [f"1:{number}" for number in range(len(versions))]
+    assert other_profile == "2:0"
@@ -0,0 +1,81 @@
+"""Число SQL-запросов списков привычек не зависит от числа привычек (нет N+1)"""
+from datetime import date, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import insert
+
+from apps.auth.utils import create_access_token
+from apps.core.query_stats import QueryStats, _current_stats, install_query_stats
+from apps.database import engine
+from apps.habits.models import Habit, HabitInstance, HabitStatus
+from apps.habits.service import habit_cache
+from apps.main import app
+from apps.profile.models import Profile
+
+HABIT_COUNTS = (1, 200)
+
+
+async def seed_profile(session, habits: int) -> int:
+    """Профиль с habits ежедневными привычками, у каждой отмечен вчерашний день"""
+    today = date.today()
+    profile_id = (await session.execute(insert(Profile).values(is_active=True).returning(Profile.id))).scalar_one()
+    habit_ids = (
+        await session.execute(
+            insert(Habit).returning(Habit.id),
+            [
+                {
+                    "name": f"habit {number}",
+                    "duration_days": 30,
+                    "days_mask": 127,
+                    "start_date": today - timedelta(days=10),
+                    "end_date": today + timedelta(days=19),
+                    "profile_id": profile_id,
+                }
+                for number in range(habits)
+            ],
+        )
+    ).scalars().all()
+    await session.execute(
+        insert(HabitInstance),
+        [
+            {"habit_id": habit_id, "date": today - timedelta(days=1), "status": HabitStatus.done}
+            for habit_id in habit_ids
+        ],
+    )
+    return profile_id
+
+
+@pytest.mark.parametrize("path", ["/api/v1/habits/", f"/api/v1/habits/date/{date.today()}"])
+def test_list_statement_count_is_flat(run_db, path):
+    async def scenario(session):
+        profile_ids = [await seed_profile(session, habits) for habits in HABIT_COUNTS]
+        await session.commit()
+        install_query_stats(engine)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            results = []
+            for profile_id in profile_ids:
+                headers = {"Authorization": f"Bearer {await create_access_token(Profile(id=profile_id))}"}
+                # Прогрев кеша профиля авторизации; ответ из habit_cache сбрасываем
+                warm_up = await client.get(path, headers=headers)
+                assert warm_up.status_code == 200
+                habit_cache.entries.clear()
+
+                stats = QueryStats()
+                token = _current_stats.set(stats)
+                try:
+                    response = await client.get(path, headers=headers)
+                finally:
+                    _current_stats.reset(token)
+                results.append((response, stats))
+        return results
+
+    (small, small_stats), (large, large_stats) = run_db(scenario)
+
+    assert small.status_code == large.status_code == 200
+    assert [len(response.json()["data"]) for response in (small, large)] == list(HABIT_COUNTS)
+    # Версия данных профиля + список одним запросом, при 1 и 200 привычках одинаково
+    assert small_stats.count == large_stats.count == 2, large_stats.fingerprints
+    assert small_stats.fingerprints == large_stats.fingerprints
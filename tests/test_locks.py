@@ -0,0 +1,109 @@
+"""Порядок блокировок записей профиля: advisory-блокировка (DailyStatsRollup.lock) берется до строк habits.
+
+Третье соединение держит блокировку профиля, пока отметка и правка/удаление привычки
+встают в очередь; после ее снятия транзакции не должны получить DeadlockDetectedError.
+"""
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from apps.core.exceptions import NotFoundException
+from apps.database import async_session, engine
+from apps.habits.models import Habit, HabitInstance, HabitStatus
+from apps.habits.rollups import DailyStatsRollup
+from apps.habits.schemas.schemas import HabitCreateSchema, HabitUpdateSchema
+from apps.habits.service import HabitService
+from apps.habits.streaks import streaks_statement
+from apps.profile.models import Profile
+
+ROUNDS = 5
+
+
+async def add_habit(session) -> int:
+    data = HabitCreateSchema(
+        name="habit", duration_days=14, days_of_week=[str(day) for day in range(7)],
+        start_date=date.today() - timedelta(days=7),
+    )
+    return (await HabitService(session).add_one(data, profile_id=1)).id
+
+
+async def mark(habit_id: int) -> str:
+    async with async_session() as session:
+        try:
+            await HabitService(session).mark_habit_instance(habit_id, date.today(), HabitStatus.done, profile_id=1)
+        except NotFoundException:
+            return "not found"
+        return "marked"
+
+
+async def update(habit_id: int) -> str:
+    async with async_session() as session:
+        data = HabitUpdateSchema(days_of_week=["0", "2", "4"])
+        habit = await HabitService(session).update_one(habit_id, data, profile_id=1)
+        return "updated" if habit else "not found"
+
+
+async def remove(habit_id: int) -> str:
+    async with async_session() as session:
+        return "deleted" if await HabitService(session).delete_one(habit_id, profile_id=1) else "not found"
+
+
+async def queued(*operations) -> list:
+    """Запуск операций, пока блокировку профиля держит другое соединение"""
+    async with engine.connect() as holder:
+        await holder.execute(select(DailyStatsRollup.lock(1)))
+        tasks = [asyncio.create_task(operation) for operation in operations]
+        await asyncio.sleep(0.3)
+        await holder.rollback()
+    return await asyncio.gather(*tasks)
+
+
+@pytest.mark.parametrize("order", ["mark_first", "mark_last"])
+def test_mark_and_delete_do_not_deadlock(run_db, order):
+    async def scenario(session):
+        await session.execute(insert(Profile), [{"id": 1}])
+        await session.commit()
+        outcomes = []
+        for _ in range(ROUNDS):
+            habit_id = await add_habit(session)
+            operations = [mark(habit_id), remove(habit_id)]
+            if order == "mark_last":
+                operations.reverse()
+            outcomes.append(sorted(await queued(*operations)))
+        leftover = (await session.execute(select(HabitInstance.id))).all()
+        drift = await DailyStatsRollup(session).check(profile_id=1)
+        return outcomes, leftover, drift
+
+    outcomes, leftover, drift = run_db(scenario)
+
+    assert all(outcome in (["deleted", "marked"], ["deleted", "not found"]) for outcome in outcomes), outcomes
+    assert leftover == []
+    assert drift == []
+
+
+@pytest.mark.parametrize("order", ["mark_first", "mark_last"])
+def test_mark_and_update_do_not_deadlock(run_db, order):
+    async def scenario(session):
+        await session.execute(insert(Profile), [{"id": 1}])
+        await session.commit()
+        outcomes = []
+        for _ in range(ROUNDS):
+            habit_id = await add_habit(session)
+            operations = [mark(habit_id), update(habit_id)]
+            if order == "mark_last":
+                operations.reverse()
+            outcomes.append(sorted(await queued(*operations)))
+        loaded = (await session.execute(select(Habit).execution_options(populate_existing=True))).scalars().all()
+        stored = {habit.id: (habit.current_streak, habit.longest_streak, habit.last_done_date) for habit in loaded}
+        recomputed = {row.id: tuple(row)[1:] for row in await session.execute(streaks_statement())}
+        await session.rollback()
+        drift = await DailyStatsRollup(session).check(profile_id=1)
+        return outcomes, stored, recomputed, drift
+
+    outcomes, stored, recomputed, drift = run_db(scenario)
+
+    assert outcomes == [["marked", "updated"]] * ROUNDS
+    assert stored == recomputed
+    assert drift == []
@@ -0,0 +1,80 @@
+"""Архивация партиций habitinstances: серии и статистика не меняются после отсоединения месяцев."""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from apps.core.exceptions import BadRequestException
+from apps.database import engine
+from apps.habits.models import Habit, HabitInstance, HabitStatus
+from apps.habits.partitions import archive_partitions, ensure_partitions, month_start, partition_name
+from apps.habits.rollups import DailyStatsRollup
+from apps.habits.service import HabitService
+from apps.habits.streaks import HabitStreaks
+from apps.profile.models import Profile
+
+
+def test_archive_freezes_streaks_and_stats(run_db):
+    today = date.today()
+    start_date, horizon = month_start(today, -3), month_start(today, -1)
+    end_date = start_date + timedelta(days=199)
+    # Серия пересекает границу архива и доходит до позавчера: после архивации она продолжается от затравки
+    done_days = [start_date + timedelta(days=offset) for offset in range((today - start_date).days - 1) if offset != 10]
+
+    async def snapshot(session) -> tuple:
+        habit = (await session.execute(select(Habit).execution_options(populate_existing=True))).scalar_one()
+        stats = await DailyStatsRollup(session).read(1, start_date, end_date)
+        await session.commit()
+        return (habit.current_streak, habit.longest_streak, habit.last_done_date), stats
+
+    async def scenario(session):
+        await session.execute(insert(Profile), [{"id": 1}])
+        habit_id = (
+            await session.execute(
+                insert(Habit).returning(Habit.id),
+                {
+                    "name": "daily",
+                    "duration_days": 200,
+                    "days_mask": 127,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "profile_id": 1,
+                },
+            )
+        ).scalar_one()
+        await session.execute(
+            insert(HabitInstance),
+            [{"habit_id": habit_id, "date": day, "status": HabitStatus.done} for day in done_days],
+        )
+        await session.commit()
+        async with engine.connect() as conn:
+            await ensure_partitions(conn, months_ahead=5, today=start_date)
+        await HabitStreaks(session).rebuild(profile_id=1)
+        await DailyStatsRollup(session).rebuild(profile_id=1)
+        before = await snapshot(session)
+
+        async with engine.connect() as conn:
+            archived = await archive_partitions(conn, older_than_months=1, drop=True, today=today)
+        # Полные пересборки после архивации читают только живые партиции и затравку серий
+        await HabitStreaks(session).rebuild(profile_id=1)
+        await DailyStatsRollup(session).rebuild(profile_id=1)
+        after = await snapshot(session)
+        drift = await DailyStatsRollup(session).check(profile_id=1)
+
+        with pytest.raises(BadRequestException):
+            await HabitService(session).mark_habit_instance(
+                habit_id, horizon - timedelta(days=1), HabitStatus.skipped, profile_id=1
+            )
+        extended = await HabitService(session).mark_habit_instance(
+            habit_id, today - timedelta(days=1), HabitStatus.done, profile_id=1
+        )
+        return archived, before, after, drift, extended
+
+    archived, before, after, drift, extended = run_db(scenario)
+
+    assert archived == [partition_name(start_date), partition_name(month_start(start_date, 1))]
+    assert after == before
+    assert drift == []
+    streak, longest, last_done = before[0]
+    assert (streak, last_done) == (len(done_days) - 10, done_days[-1])
+    assert extended.current_streak == streak + 1
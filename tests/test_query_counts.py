@@ -0,0 +1,78 @@
+"""Число SQL-запросов эндпоинтов записи (события before/after_cursor_execute, apps.core.query_stats)"""
+from datetime import date, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import insert
+
+from apps.auth.utils import create_access_token
+from apps.core.query_stats import QueryStats, _current_stats, install_query_stats
+from apps.database import engine
+from apps.habits.models import Habit
+from apps.main import app
+from apps.profile.models import Profile
+
+
+@pytest.mark.parametrize(
+    "status, days_ago, statements",
+    [
+        ("done", 0, 2),
+        ("skipped", 0, 2),
+        ("pending", 0, 2),
+        # Повторная отметка последнего выполненного дня серий не меняет
+        ("done", 2, 2),
+        # Правка последнего выполненного дня: третьим запросом пересчитываются серии
+        ("skipped", 2, 3),
+    ],
+)
+def test_mark_habit_instance_statement_count(run_db, status, days_ago, statements):
+    today = date.today()
+
+    async def scenario(session):
+        profile_id = (await session.execute(insert(Profile).values(is_active=True).returning(Profile.id))).scalar_one()
+        habit_id = (
+            await session.execute(
+                insert(Habit).returning(Habit.id),
+                [
+                    {
+                        "name": "habit",
+                        "duration_days": 20,
+                        "days_mask": 127,
+                        "start_date": today - timedelta(days=10),
+                        "end_date": today + timedelta(days=9),
+                        "profile_id": profile_id,
+                    }
+                ],
+            )
+        ).scalar_one()
+        await session.commit()
+        install_query_stats(engine)
+
+        headers = {"Authorization": f"Bearer {await create_access_token(Profile(id=profile_id))}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            url = f"/api/v1/habits/{habit_id}/instance"
+            # Первая отметка прогревает кеш профиля и соединение пула
+            warm_up = await client.put(url, json={"instance_date": str(today - timedelta(days=2)), "status": "done"})
+            assert warm_up.status_code == 200
+
+            stats = QueryStats()
+            token = _current_stats.set(stats)
+            try:
+                response = await client.put(
+                    url, json={"instance_date": str(today - timedelta(days=days_ago)), "status": status}
+                )
+            finally:
+                _current_stats.reset(token)
+        return response, stats
+
+    response, stats = run_db(scenario)
+
+    assert response.status_code == 200
+    # Владение + запись + серия + ответ одним CTE, затем пересчет дня в profile_daily_stats;
+    # COMMIT не курсорный запрос
+    assert stats.count == statements, stats.fingerprints
+    first, second, *rest = stats.fingerprints
+    assert first.startswith("WITH owned_habit")
+    assert "INSERT INTO profile_daily_stats" in second
+    assert all(fingerprint.startswith("UPDATE habits") for fingerprint in rest)
@@ -0,0 +1,127 @@
+"""Планы запросов чтения: индекс ix_habits_profile_schedule и индекс истории.
+
+enable_seqscan=off не заставляет планировщик взять неподходящий индекс: если
+условия запроса не совпадают с ведущими колонками индексов, в плане останется
+Seq Scan. Проверяются только гарантии планировщика: кроме первичного ключа,
+у habits нет другого индекса по profile_id, так что выбор не зависит от стоимости.
+"""
+import json
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from apps.habits.models import Habit, HabitInstance, HabitStatus
+from apps.habits.service import HabitService
+from apps.habits.stats import calendar_stats_statement
+from apps.profile.models import Profile
+
+TARGET_DATE = date(2026, 3, 11)
+PROFILES = 20
+HABITS_PER_PROFILE = 100
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def explain(session, statement) -> dict:
+    conn = await session.connection()
+    plan = (await conn.execute(Explain(statement))).scalar()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def index_names(plan: dict) -> set:
+    return {node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node}
+
+
+def seq_scans(plan: dict) -> list:
+    return [
+        node["Relation Name"]
+        for node in plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"].startswith(("habits", "habitinstances"))
+    ]
+
+
+async def seed(session) -> None:
+    """Половина привычек неактивна, диапазоны разбросаны на год вокруг TARGET_DATE"""
+    rng = random.Random(7)
+    await session.execute(insert(Profile), [{"id": profile_id} for profile_id in range(1, PROFILES + 1)])
+    habits = []
+    for profile_id in range(1, PROFILES + 1):
+        for number in range(HABITS_PER_PROFILE):
+            start_date = TARGET_DATE + timedelta(days=rng.randint(-365, 365))
+            duration = rng.randint(7, 60)
+            habits.append(
+                {
+                    "name": f"habit {number}",
+                    "duration_days": duration,
+                    "days_mask": rng.randint(1, 127),
+                    "start_date": start_date,
+                    "end_date": start_date + timedelta(days=duration - 1),
+                    "is_active": number % 2 == 0,
+                    "profile_id": profile_id,
+                }
+            )
+    habit_rows = (await session.execute(insert(Habit).returning(Habit.id, Habit.start_date), habits)).all()
+    instances = [
+        {
+            "habit_id": habit_id,
+            "date": start_date + timedelta(days=offset),
+            "status": rng.choice([HabitStatus.done, HabitStatus.skipped]),
+        }
+        for habit_id, start_date in habit_rows
+        for offset in range(0, 30, 3)
+    ]
+    await session.execute(insert(HabitInstance), instances)
+    await session.commit()
+    await session.execute(text("ANALYZE"))
+    await session.execute(text("SET LOCAL enable_seqscan = off"))
+
+
+def test_habits_for_date_uses_schedule_index(run_db):
+    async def scenario(session):
+        await seed(session)
+        return await explain(session, HabitService._habits_for_date(1, TARGET_DATE))
+
+    plan = run_db(scenario)
+    assert "ix_habits_profile_schedule" in index_names(plan)
+    assert seq_scans(plan) == []
+
+
+def test_latest_status_uses_history_index(run_db):
+    async def scenario(session):
+        await seed(session)
+        return await explain(session, HabitService._habits_with_latest_status().where(Habit.profile_id == 1))
+
+    plan = run_db(scenario)
+    # Имена индексов партиции создает PostgreSQL: habitinstances_default_habit_id_date_id_idx
+    # или habitinstances_default_habit_id_date_key (uq_habit_date) - оба начинаются с (habit_id, date)
+    assert any("habit_id_date" in name for name in index_names(plan))
+    assert seq_scans(plan) == []
+
+
+def test_calendar_stats_uses_schedule_index(run_db):
+    async def scenario(session):
+        await seed(session)
+        return await explain(session, calendar_stats_statement(1, TARGET_DATE.replace(day=1), TARGET_DATE))
+
+    plan = run_db(scenario)
+    assert "ix_habits_profile_schedule" in index_names(plan)
+    assert seq_scans(plan) == []
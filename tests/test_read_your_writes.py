@@ -0,0 +1,70 @@
+"""Токен окна read-your-writes: проверяется любым воркером по подписи и сроку."""
+import asyncio
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+
+from apps.core.config import settings
+from apps.database.read_your_writes import (
+    COOKIE_NAME,
+    HEADER_NAME,
+    ReadYourWritesMiddleware,
+    issue_token,
+    reads_from_primary,
+)
+
+NOW = 1_800_000_000.0
+
+
+def test_token_is_bound_to_profile_and_window():
+    token = issue_token(1, now=NOW)
+
+    assert reads_from_primary(token, 1, now=NOW + settings.READ_YOUR_WRITES_SECONDS - 0.1)
+    assert not reads_from_primary(token, 1, now=NOW + settings.READ_YOUR_WRITES_SECONDS)
+    assert not reads_from_primary(token, 2, now=NOW)
+    assert not reads_from_primary(None, 1, now=NOW)
+    assert not reads_from_primary("garbage", 1, now=NOW)
+
+
+def test_token_signature_is_checked():
+    profile_id, until, signature = issue_token(1, now=NOW).split(":")
+    extended = f"{profile_id}:{int(until) + 60_000}:{signature}"
+    foreign = f"2:{until}:{signature}"
+
+    assert not reads_from_primary(extended, 1, now=NOW)
+    assert not reads_from_primary(foreign, 2, now=NOW)
+
+
+def test_middleware_issues_token_only_after_successful_write():
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    @app.post("/profile/{profile_id}/habits")
+    async def write(profile_id: int):
+        return {}
+
+    @app.post("/failed")
+    async def failed(request: Request):
+        request.state.profile_id = 1
+        raise HTTPException(status_code=400)
+
+    @app.get("/profile/{profile_id}/habits")
+    async def read(profile_id: int):
+        return {}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return (
+                await client.post("/profile/1/habits"),
+                await client.post("/failed"),
+                await client.get("/profile/1/habits"),
+            )
+
+    written, failed_write, read_back = asyncio.run(scenario())
+
+    token = written.headers[HEADER_NAME]
+    assert reads_from_primary(token, 1)
+    assert written.cookies[COOKIE_NAME] == token
+    assert HEADER_NAME not in failed_write.headers
+    assert HEADER_NAME not in read_back.headers
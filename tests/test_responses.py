@@ -0,0 +1,86 @@
+"""FastJSONResponse против прежней сериализации FastAPI (response_model + jsonable_encoder + JSONResponse).
+
+Тело ответа должно совпадать побайтно; время сериализации сравнивается на больших
+списках привычек и на календаре за год.
+"""
+import timeit
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from apps.core.responses import FastJSONResponse
+from apps.habits.schemas.responses import DayStatsListResponse, HabitListResponse
+from apps.habits.schemas.schemas import HabitSchema
+from apps.habits.stats import build_day_stats
+
+START = date(2026, 1, 1)
+REPEATS = 5
+
+
+def habit_list(habits: int) -> HabitListResponse:
+    """Ответ списка привычек, собранный как в HabitService._to_schema"""
+    updated_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    data = [
+        HabitSchema.model_construct(
+            id=number,
+            name=f"Привычка {number}",
+            description="Описание \"в кавычках\"" if number % 2 else None,
+            duration_days=30,
+            days_of_week=["0", "2", "4"],
+            start_date=START,
+            end_date=START + timedelta(days=29),
+            is_active=True,
+            profile_id=1,
+            created_at=updated_at,
+            updated_at=updated_at,
+            habit_status=("done", "skipped", None)[number % 3],
+            current_streak=number % 7,
+            longest_streak=number % 11,
+            last_done_date=START + timedelta(days=number % 30) if number % 5 else None,
+        )
+        for number in range(habits)
+    ]
+    return HabitListResponse.model_construct(data=data)
+
+
+def calendar(days: int, habits: int) -> DayStatsListResponse:
+    data = [
+        build_day_stats(START + timedelta(days=offset), habits, offset % habits, int(offset % 3 == 0))
+        for offset in range(days)
+    ]
+    return DayStatsListResponse.model_construct(data=data)
+
+
+def previous_body(payload) -> bytes:
+    """Путь FastAPI до FastJSONResponse: повторная валидация по response_model и jsonable_encoder"""
+    validated = type(payload).model_validate(payload.model_dump(by_alias=True))
+    return JSONResponse(jsonable_encoder(validated, by_alias=True)).body
+
+
+def fast_body(payload) -> bytes:
+    return FastJSONResponse(payload).body
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [habit_list(0), habit_list(10), habit_list(1000), calendar(366, 10)],
+    ids=["empty", "10 habits", "1000 habits", "calendar"],
+)
+def test_fast_json_matches_previous_serialization(payload):
+    assert fast_body(payload) == previous_body(payload)
+
+
+@pytest.mark.parametrize("habits", [10, 100, 1000])
+def test_fast_json_serialization_time(habits):
+    """Микробенчмарк: лучшее из REPEATS для каждого пути сериализации"""
+    payload = habit_list(habits)
+    number = max(1, 1000 // habits)
+
+    previous = min(timeit.repeat(lambda: previous_body(payload), number=number, repeat=REPEATS))
+    fast = min(timeit.repeat(lambda: fast_body(payload), number=number, repeat=REPEATS))
+
+    print(f"{habits} habits: {previous / number * 1000:.2f} ms -> {fast / number * 1000:.2f} ms")
+    # Без валидации и обхода jsonable_encoder сериализация минимум вдвое быстрее
+    assert fast * 2 < previous
@@ -0,0 +1,56 @@
+"""Статистика дней: total_habits считает активные привычки диапазона, а не только запланированные на день."""
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from apps.habits.models import Habit, HabitStatus
+from apps.habits.service import HabitService
+from apps.profile.models import Profile
+
+MONDAY = date(2026, 3, 9)
+
+
+def test_calendar_stats_count_active_habits_in_range(run_db):
+    async def scenario(session):
+        await session.execute(insert(Profile), [{"id": 1}])
+        habit_id = (
+            await session.execute(
+                insert(Habit).returning(Habit.id),
+                {
+                    "name": "monday",
+                    "duration_days": 7,
+                    "days_mask": 0b0000001,
+                    "start_date": MONDAY,
+                    "end_date": MONDAY + timedelta(days=6),
+                    "profile_id": 1,
+                },
+            )
+        ).scalar_one()
+        await session.execute(
+            insert(Habit),
+            {
+                "name": "inactive",
+                "duration_days": 7,
+                "days_mask": 0b1111111,
+                "start_date": MONDAY,
+                "end_date": MONDAY + timedelta(days=6),
+                "is_active": False,
+                "profile_id": 1,
+            },
+        )
+        await session.commit()
+
+        service = HabitService(session)
+        await service.rollup.rebuild(profile_id=1)
+        await session.commit()
+        await service.mark_habit_instance(habit_id, MONDAY, HabitStatus.done, profile_id=1)
+        return await service.get_calendar_stats(1, MONDAY - timedelta(days=1), MONDAY + timedelta(days=7))
+
+    stats = {day.date: day for day in run_db(scenario)}
+
+    assert stats[MONDAY - timedelta(days=1)].total_habits == 0
+    assert stats[MONDAY + timedelta(days=7)].total_habits == 0
+    assert (stats[MONDAY].total_habits, stats[MONDAY].completed_habits) == (1, 1)
+    # Вторник не запланирован, но привычка активна: день учитывается как pending
+    tuesday = stats[MONDAY + timedelta(days=1)]
+    assert (tuesday.total_habits, tuesday.pending_habits, tuesday.completion_percentage) == (1, 1, 0)
@@ -0,0 +1,110 @@
+"""Инкрементальные серии (HabitStreaks.apply_mark) против полного пересчета (streaks_statement).
+
+Случайные расписания и последовательности отметок done/skipped/pending, в том числе
+правки прошлых дней, незапланированные дни и даты вне диапазона привычки.
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from apps.habits.models import Habit, HabitStatus
+from apps.habits.schedule import scheduled_dates
+from apps.habits.service import HabitService
+from apps.habits.streaks import current_streak, streaks_statement
+from apps.profile.models import Profile
+
+HABITS = 30
+MARKS = 600
+STATUSES = [HabitStatus.done] * 3 + [HabitStatus.skipped, HabitStatus.pending]
+
+
+def reference_streaks(habit: dict, done_days: set) -> tuple:
+    """(current_streak, longest_streak, last_done_date) прямым проходом по расписанию"""
+    run = current = longest = 0
+    last_done = None
+    for day in scheduled_dates(habit["start_date"], habit["end_date"], habit["days_mask"]):
+        run = run + 1 if day in done_days else 0
+        if run:
+            current, last_done = run, day
+            longest = max(longest, run)
+    return current, longest, last_done
+
+
+def reference_current_streak(habit: dict, done_days: set, today: date) -> int:
+    """Серия сгорает, если между последним выполненным днем и today есть пропущенный запланированный"""
+    current, _, last_done = reference_streaks(habit, done_days)
+    if last_done is None:
+        return 0
+    days = scheduled_dates(habit["start_date"], habit["end_date"], habit["days_mask"])
+    return 0 if any(last_done < day < today for day in days) else current
+
+
+def random_habits(rng: random.Random) -> list:
+    today = date.today()
+    habits = []
+    for number in range(HABITS):
+        # Часть привычек закончилась или закончится: серии успевают сгореть
+        start_date = today + timedelta(days=rng.randint(-90, 10))
+        duration = rng.randint(1, 60)
+        habits.append(
+            {
+                "name": f"habit {number}",
+                "duration_days": duration,
+                "days_mask": rng.randint(1, 127),
+                "start_date": start_date,
+                "end_date": start_date + timedelta(days=duration - 1),
+                "profile_id": 1,
+            }
+        )
+    return habits
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_incremental_streaks_match_full_recompute(run_db, seed):
+    rng = random.Random(seed)
+    habits = random_habits(rng)
+
+    async def scenario(session):
+        await session.execute(insert(Profile), [{"id": 1}])
+        inserted = insert(Habit).returning(Habit.id, sort_by_parameter_order=True)
+        habit_ids = (await session.execute(inserted, habits)).scalars().all()
+        await session.commit()
+        by_id = dict(zip(habit_ids, habits))
+
+        service = HabitService(session)
+        marks = {}
+        for _ in range(MARKS):
+            habit_id = rng.choice(habit_ids)
+            habit = by_id[habit_id]
+            # Даты немного выходят за диапазон привычки; порядок отметок случайный (правки прошлого)
+            offset = rng.randint(-3, (habit["end_date"] - habit["start_date"]).days + 3)
+            day = habit["start_date"] + timedelta(days=offset)
+            status = rng.choice(STATUSES)
+            await service.mark_habit_instance(habit_id, day, status, profile_id=1)
+            marks[habit_id, day] = status
+
+        loaded = (await session.execute(select(Habit).execution_options(populate_existing=True))).scalars().all()
+        stored = {habit.id: (habit.current_streak, habit.longest_streak, habit.last_done_date) for habit in loaded}
+        checkpoints = {
+            habit.id: {
+                today: current_streak(habit, today)
+                for today in (habit.start_date, habit.end_date, date.today(), habit.end_date + timedelta(days=10))
+            }
+            for habit in loaded
+        }
+        recomputed = {row.id: tuple(row)[1:] for row in await session.execute(streaks_statement())}
+        await session.rollback()
+        return by_id, marks, stored, recomputed, checkpoints
+
+    by_id, marks, stored, recomputed, checkpoints = run_db(scenario)
+
+    assert stored == recomputed
+    for habit_id, habit in by_id.items():
+        done_days = {
+            day for (marked_id, day), status in marks.items() if marked_id == habit_id and status == HabitStatus.done
+        }
+        assert stored[habit_id] == reference_streaks(habit, done_days), habit
+        for today, streak in checkpoints[habit_id].items():
+            assert streak == reference_current_streak(habit, done_days, today), (habit, today)